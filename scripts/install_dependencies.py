@@ -149,6 +149,8 @@ def install_python_dependencies():
     dev_packages = [
         "pytest",
         "pytest-cov",
+        "pytest-asyncio>=0.24",
+        "pytest-xdist",
         "black",
         "flake8",
         "mypy"
@@ -156,7 +158,7 @@ def install_python_dependencies():
     
     for package in dev_packages:
         try:
-            run_command(f"pip install {package}")
+            run_command(f'pip install "{package}"')
         except subprocess.CalledProcessError:
             print(f"Warning: Failed to install {package}")
 
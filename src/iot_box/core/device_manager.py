@@ -7,7 +7,8 @@ Handles device detection, registration, and management for various scanner types
 import asyncio
 import logging
 import time
-from typing import Dict, List, Optional, Any
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 import yaml
@@ -36,6 +37,15 @@ class DeviceStatus(Enum):
     UNKNOWN = "unknown"
 
 
+# Enum values precomputed for status reporting
+_DEVICE_TYPE_VALUES = {device_type: device_type.value for device_type in DeviceType}
+_STATUS_VALUES = {status: status.value for status in DeviceStatus}
+
+# Statuses checked on every scan
+_CONNECTED = DeviceStatus.CONNECTED
+_ERROR = DeviceStatus.ERROR
+
+
 @dataclass
 class Device:
     """Device information dataclass"""
@@ -50,18 +60,113 @@ class Device:
     max_errors: int = 5
 
 
+class _DeviceRegistry(dict):
+    """Device dict that keeps per-type and connected indexes in step with its contents.
+    
+    Status changes of a registered device must go through set_status so
+    the connected index stays accurate.
+    """
+    
+    def __init__(self, devices: Union[Dict[str, Device], Iterable[Tuple[str, Device]]] = ()):
+        super().__init__()
+        self.by_type: Dict[DeviceType, Dict[str, Device]] = defaultdict(dict)
+        self.connected: Dict[str, Device] = {}
+        self.update(devices)
+    
+    def _index(self, device_id: str, device: Device):
+        """Add a device to the indexes"""
+        self.by_type[device.type][device_id] = device
+        if device.status is _CONNECTED:
+            self.connected[device_id] = device
+    
+    def _unindex(self, device_id: str, device: Device):
+        """Remove a device from the indexes"""
+        devices_of_type = self.by_type.get(device.type)
+        if devices_of_type is not None:
+            devices_of_type.pop(device_id, None)
+            if not devices_of_type:
+                del self.by_type[device.type]
+        self.connected.pop(device_id, None)
+    
+    def __setitem__(self, device_id: str, device: Device):
+        old = self.get(device_id)
+        if old is not None:
+            self._unindex(device_id, old)
+        super().__setitem__(device_id, device)
+        self._index(device_id, device)
+    
+    def __delitem__(self, device_id: str):
+        self._unindex(device_id, self[device_id])
+        super().__delitem__(device_id)
+    
+    def pop(self, device_id: str, *default):
+        if device_id in self:
+            self._unindex(device_id, self[device_id])
+        return super().pop(device_id, *default)
+    
+    def popitem(self):
+        device_id, device = super().popitem()
+        self._unindex(device_id, device)
+        return device_id, device
+    
+    def setdefault(self, device_id: str, device: Device = None):
+        if device_id not in self:
+            self[device_id] = device
+        return self[device_id]
+    
+    def update(self, *args, **kwargs):
+        for device_id, device in dict(*args, **kwargs).items():
+            self[device_id] = device
+    
+    def __ior__(self, other):
+        self.update(other)
+        return self
+    
+    def clear(self):
+        super().clear()
+        self.by_type.clear()
+        self.connected.clear()
+    
+    def set_status(self, device: Device, status: DeviceStatus):
+        """Change a device's status, updating the connected index if it is registered"""
+        device.status = status
+        if self.get(device.id) is not device:
+            return
+        if status is _CONNECTED:
+            self.connected[device.id] = device
+        else:
+            self.connected.pop(device.id, None)
+
+
 class DeviceManager:
     """Manages all connected devices and their handlers"""
     
     def __init__(self, config_path: str = "config/devices.yaml"):
         self.config_path = config_path
-        self.devices: Dict[str, Device] = {}
+        self.devices = {}
         self.handlers: Dict[DeviceType, BaseHandler] = {}
         self.running = False
         self.scan_interval = 5.0
+        self.fallback_scan_interval = 30.0
+        self._hotplug_event = asyncio.Event()
+        self._udev_monitor = None
         self._load_config()
         self._initialize_handlers()
         
+    @property
+    def devices(self) -> _DeviceRegistry:
+        """Registered devices by ID"""
+        return self._devices
+    
+    @devices.setter
+    def devices(self, devices: Dict[str, Device]):
+        # Assigning a plain dict re-indexes it
+        self._devices = _DeviceRegistry(devices)
+    
+    def _set_status(self, device: Device, status: DeviceStatus):
+        """Set a device's status, keeping the connected index current"""
+        self._devices.set_status(device, status)
+    
     def _load_config(self):
         """Load device configuration from YAML file"""
         try:
@@ -71,6 +176,7 @@ class DeviceManager:
             # Set scan intervals
             detection_config = self.config.get('detection', {})
             self.scan_interval = detection_config.get('scan_interval', 5.0)
+            self.fallback_scan_interval = detection_config.get('fallback_scan_interval', 30.0)
             
             logger.info(f"Loaded device configuration from {self.config_path}")
             
@@ -104,20 +210,97 @@ class DeviceManager:
         self.running = False
         logger.info("Stopping device manager")
         
+        # Stop hotplug notifications and wake the detection loop so it exits
+        self._stop_hotplug_monitor()
+        self._hotplug_event.set()
+        
         # Disconnect all devices
         for device in self.devices.values():
             if device.handler:
                 await device.handler.disconnect()
     
     async def _device_detection_loop(self):
-        """Main device detection loop"""
+        """Main device detection loop.
+        
+        With udev hotplug notifications, USB devices are rescanned only when
+        the kernel reports a change and a full scan runs on the slow fallback
+        interval (Bluetooth and network scanners have no hotplug events).
+        Without them every scan_interval triggers a full scan.
+        """
+        hotplug = self._start_hotplug_monitor()
+        interval = self.fallback_scan_interval if hotplug else self.scan_interval
+        full_scan = True
+        
         while self.running:
             try:
-                await self._scan_for_devices()
-                await asyncio.sleep(self.scan_interval)
+                if full_scan:
+                    await self._scan_for_devices()
+                elif self.config.get('detection', {}).get('usb', {}).get('enabled', True):
+                    await self._scan_usb_devices()
+                
+                try:
+                    await asyncio.wait_for(self._hotplug_event.wait(), interval)
+                    self._hotplug_event.clear()
+                    full_scan = False
+                except asyncio.TimeoutError:
+                    full_scan = True
             except Exception as e:
                 logger.error(f"Error in device detection loop: {e}")
                 await asyncio.sleep(5)
+        
+        self._stop_hotplug_monitor()
+    
+    def _start_hotplug_monitor(self) -> bool:
+        """Watch udev for USB and tty changes, returns False if unavailable"""
+        if not self.config.get('detection', {}).get('hotplug', True):
+            return False
+        
+        try:
+            import pyudev
+            
+            context = pyudev.Context()
+            monitor = pyudev.Monitor.from_netlink(context)
+            monitor.filter_by('usb')
+            monitor.filter_by('tty')
+            monitor.start()
+            
+            asyncio.get_running_loop().add_reader(monitor.fileno(), self._on_udev_event)
+            self._udev_monitor = monitor
+            
+            logger.info("Listening for USB hotplug events")
+            return True
+            
+        except ImportError:
+            logger.warning("pyudev not available, polling for devices every %ss", self.scan_interval)
+            return False
+        except Exception as e:
+            logger.error("Error starting hotplug monitor, polling instead: %s", e)
+            return False
+    
+    def _on_udev_event(self):
+        """Drain pending udev events and wake the detection loop"""
+        monitor = self._udev_monitor
+        if monitor is None:
+            return
+        
+        while True:
+            device = monitor.poll(timeout=0)
+            if device is None:
+                break
+            logger.debug("Hotplug %s: %s", device.action, device.sys_path)
+        
+        self._hotplug_event.set()
+    
+    def _stop_hotplug_monitor(self):
+        """Stop watching udev"""
+        monitor, self._udev_monitor = self._udev_monitor, None
+        if monitor is None:
+            return
+        
+        try:
+            asyncio.get_running_loop().remove_reader(monitor.fileno())
+        except Exception as e:
+            logger.debug("Error removing hotplug reader: %s", e)
     
     async def _scan_for_devices(self):
         """Scan for new devices"""
@@ -294,19 +477,17 @@ class DeviceManager:
     
     def get_devices_by_type(self, device_type: DeviceType) -> List[Device]:
         """Get all devices of a specific type"""
-        return [device for device in self.devices.values() 
-                if device.type == device_type]
+        return list(self._devices.by_type.get(device_type, {}).values())
     
     def get_connected_devices(self) -> List[Device]:
         """Get all connected devices"""
-        return [device for device in self.devices.values() 
-                if device.status == DeviceStatus.CONNECTED]
+        return list(self._devices.connected.values())
     
     async def scan_device(self, device_id: str) -> Optional[str]:
         """Scan from a specific device"""
         device = self.get_device(device_id)
         
-        if not device or device.status != DeviceStatus.CONNECTED:
+        if not device or device.status is not _CONNECTED:
             logger.warning(f"Device {device_id} not available for scanning")
             return None
         
@@ -319,33 +500,32 @@ class DeviceManager:
             else:
                 device.error_count += 1
                 if device.error_count >= device.max_errors:
-                    device.status = DeviceStatus.ERROR
+                    self._set_status(device, _ERROR)
                     logger.error(f"Device {device_id} exceeded max errors")
                 
         except Exception as e:
             device.error_count += 1
-            device.status = DeviceStatus.ERROR
+            self._set_status(device, _ERROR)
             logger.error(f"Error scanning device {device_id}: {e}")
             
         return None
     
     def get_device_status(self) -> Dict[str, Any]:
         """Get status of all devices"""
-        status = {
-            "total_devices": len(self.devices),
-            "connected_devices": len(self.get_connected_devices()),
-            "devices": []
-        }
-        
-        for device in self.devices.values():
-            device_status = {
+        devices = [
+            {
                 "id": device.id,
                 "name": device.name,
-                "type": device.type.value,
-                "status": device.status.value,
+                "type": _DEVICE_TYPE_VALUES[device.type],
+                "status": _STATUS_VALUES[device.status],
                 "last_seen": device.last_seen,
                 "error_count": device.error_count
             }
-            status["devices"].append(device_status)
+            for device in self._devices.values()
+        ]
         
-        return status
+        return {
+            "total_devices": len(devices),
+            "connected_devices": len(self._devices.connected),
+            "devices": devices
+        }
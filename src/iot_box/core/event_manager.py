@@ -5,10 +5,13 @@ Handles event processing, validation, and routing to Odoo integration.
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
 import time
 import uuid
-from typing import Dict, List, Optional, Any, Callable
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Any, Callable, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import json
@@ -37,6 +40,11 @@ class EventStatus(Enum):
     CANCELLED = "cancelled"
 
 
+# Enum values precomputed for statistics and export
+_EVENT_TYPE_VALUES = {event_type: event_type.value for event_type in EventType}
+_STATUS_VALUES = {status: status.value for status in EventStatus}
+
+
 @dataclass
 class Event:
     """Event data structure"""
@@ -60,25 +68,167 @@ class Event:
             self.metadata = {}
 
 
+class _EventRegistry(dict):
+    """Event dict that keeps status, type, device and work order indexes in step with its contents.
+    
+    Status changes of a stored event must go through set_status so the
+    status index stays accurate. A min-heap of (timestamp, event_id) lets
+    old events be expired without visiting the rest.
+    """
+    
+    def __init__(self, events: Union[Dict[str, Event], Iterable[Tuple[str, Event]]] = ()):
+        super().__init__()
+        self.by_status: Dict[EventStatus, Dict[str, Event]] = defaultdict(dict)
+        self.by_type: Dict[EventType, Dict[str, Event]] = defaultdict(dict)
+        self.by_device: Dict[str, Dict[str, Event]] = defaultdict(dict)
+        self.by_work_order: Dict[str, Dict[str, Event]] = defaultdict(dict)
+        # Entries are never removed eagerly; stale ones are dropped when popped
+        self._time_heap: List[Tuple[float, str]] = []
+        self.update(events)
+    
+    def _indexes(self, event: Event):
+        """Yield (index, key) for every index the event belongs in"""
+        yield self.by_status, event.status
+        yield self.by_type, event.type
+        yield self.by_device, event.device_id
+        if event.work_order_id:
+            yield self.by_work_order, event.work_order_id
+    
+    def _index(self, event_id: str, event: Event):
+        """Add an event to the indexes"""
+        for index, key in self._indexes(event):
+            index[key][event_id] = event
+    
+    def _unindex(self, event_id: str, event: Event):
+        """Remove an event from the indexes"""
+        for index, key in self._indexes(event):
+            _discard(index, key, event_id)
+    
+    def __setitem__(self, event_id: str, event: Event):
+        old = self.get(event_id)
+        if old is not None:
+            self._unindex(event_id, old)
+        super().__setitem__(event_id, event)
+        self._index(event_id, event)
+        heapq.heappush(self._time_heap, (event.timestamp, event_id))
+    
+    def __delitem__(self, event_id: str):
+        self._unindex(event_id, self[event_id])
+        super().__delitem__(event_id)
+    
+    def pop(self, event_id: str, *default):
+        if event_id in self:
+            self._unindex(event_id, self[event_id])
+        return super().pop(event_id, *default)
+    
+    def popitem(self):
+        event_id, event = super().popitem()
+        self._unindex(event_id, event)
+        return event_id, event
+    
+    def setdefault(self, event_id: str, event: Event = None):
+        if event_id not in self:
+            self[event_id] = event
+        return self[event_id]
+    
+    def update(self, *args, **kwargs):
+        for event_id, event in dict(*args, **kwargs).items():
+            self[event_id] = event
+    
+    def __ior__(self, other):
+        self.update(other)
+        return self
+    
+    def clear(self):
+        super().clear()
+        for index in (self.by_status, self.by_type, self.by_device, self.by_work_order):
+            index.clear()
+        self._time_heap.clear()
+    
+    def set_status(self, event: Event, status: EventStatus):
+        """Change an event's status, moving it between status buckets if it is stored"""
+        if self.get(event.id) is event and event.status != status:
+            _discard(self.by_status, event.status, event.id)
+            self.by_status[status][event.id] = event
+        event.status = status
+    
+    def expire(self, cutoff: float, status: EventStatus) -> List[str]:
+        """Remove events with the given status whose timestamp is before cutoff.
+        
+        Only heap entries older than cutoff are visited. Old events in
+        another status are kept and checked again on the next call.
+        """
+        heap = self._time_heap
+        removed = []
+        kept = {}
+        while heap and heap[0][0] < cutoff:
+            timestamp, event_id = heapq.heappop(heap)
+            event = self.get(event_id)
+            if event is None or event_id in kept:
+                continue
+            if event.timestamp != timestamp:
+                # Timestamp changed after insertion, file it under the new one
+                heapq.heappush(heap, (event.timestamp, event_id))
+                continue
+            if event.status == status:
+                del self[event_id]
+                removed.append(event_id)
+            else:
+                kept[event_id] = timestamp
+        for event_id, timestamp in kept.items():
+            heapq.heappush(heap, (timestamp, event_id))
+        return removed
+
+
+def _discard(index: Dict[Any, Dict[str, Event]], key: Any, event_id: str):
+    """Remove an event from one index bucket, dropping the bucket when empty"""
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.pop(event_id, None)
+        if not bucket:
+            del index[key]
+
+
 class EventManager:
     """Manages event processing and routing"""
     
     def __init__(self):
-        self.events: Dict[str, Event] = {}
+        self.events = {}
         self.event_handlers: Dict[EventType, List[Callable]] = {}
         self.running = False
         self.processing_queue = asyncio.Queue()
         self.max_queue_size = 1000
         self.processing_workers = 4
+        self._workers: List[asyncio.Task] = []
+        # Event IDs are a per-process random prefix plus a counter, so they
+        # stay short and do not repeat across restarts
+        self._id_prefix = uuid.uuid4().hex[:8]
+        self._id_counter = itertools.count(1)
         
+    @property
+    def events(self) -> _EventRegistry:
+        """Stored events by ID"""
+        return self._events
+    
+    @events.setter
+    def events(self, events: Dict[str, Event]):
+        # Assigning a plain dict re-indexes it
+        self._events = _EventRegistry(events)
+    
+    def _set_status(self, event: Event, status: EventStatus):
+        """Set an event's status, keeping the status index current"""
+        self._events.set_status(event, status)
+    
     async def start(self):
         """Start the event manager"""
         self.running = True
         logger.info("Starting event manager")
         
         # Start processing workers
-        for i in range(self.processing_workers):
+        self._workers = [
             asyncio.create_task(self._event_processor(f"worker-{i}"))
+            for i in range(self.processing_workers)
+        ]
     
     async def stop(self):
         """Stop the event manager"""
@@ -87,6 +237,12 @@ class EventManager:
         
         # Wait for queue to empty
         await self.processing_queue.join()
+        
+        # Workers block on the queue until cancelled
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
     
     def register_handler(self, event_type: EventType, handler: Callable):
         """Register an event handler"""
@@ -107,7 +263,7 @@ class EventManager:
                           metadata: Optional[Dict[str, Any]] = None) -> str:
         """Create a new event"""
         
-        event_id = str(uuid.uuid4())
+        event_id = f"{self._id_prefix}-{next(self._id_counter):x}"
         
         event = Event(
             id=event_id,
@@ -127,43 +283,43 @@ class EventManager:
         # Add to processing queue
         try:
             await self.processing_queue.put(event)
-            logger.debug(f"Created event {event_id} of type {event_type}")
+            logger.debug("Created event %s of type %s", event_id, event_type)
         except asyncio.QueueFull:
             logger.error("Event processing queue is full")
-            event.status = EventStatus.FAILED
+            self._set_status(event, EventStatus.FAILED)
             event.error_message = "Processing queue full"
         
         return event_id
     
     async def _event_processor(self, worker_name: str):
-        """Event processing worker"""
+        """Event processing worker, runs until cancelled by stop()"""
         logger.info(f"Started event processor: {worker_name}")
         
-        while self.running:
+        # Bound once for the life of the worker
+        get_event = self.processing_queue.get
+        task_done = self.processing_queue.task_done
+        process_event = self._process_event
+        
+        while True:
+            # Sleep until an event is queued
+            event = await get_event()
+            
             try:
-                # Get event from queue
-                event = await asyncio.wait_for(
-                    self.processing_queue.get(), 
-                    timeout=1.0
-                )
-                
-                await self._process_event(event)
-                self.processing_queue.task_done()
-                
-            except asyncio.TimeoutError:
-                continue
+                await process_event(event)
             except Exception as e:
                 logger.error(f"Error in event processor {worker_name}: {e}")
+            finally:
+                task_done()
     
     async def _process_event(self, event: Event):
         """Process a single event"""
         try:
-            event.status = EventStatus.PROCESSING
-            logger.debug(f"Processing event {event.id} of type {event.type}")
+            self._set_status(event, EventStatus.PROCESSING)
+            logger.debug("Processing event %s of type %s", event.id, event.type)
             
             # Validate event data
             if not await self._validate_event(event):
-                event.status = EventStatus.FAILED
+                self._set_status(event, EventStatus.FAILED)
                 event.error_message = "Event validation failed"
                 return
             
@@ -172,7 +328,7 @@ class EventManager:
             
             if not handlers:
                 logger.warning(f"No handlers registered for event type: {event.type}")
-                event.status = EventStatus.COMPLETED
+                self._set_status(event, EventStatus.COMPLETED)
                 return
             
             # Execute handlers
@@ -182,15 +338,15 @@ class EventManager:
                 except Exception as e:
                     logger.error(f"Error in event handler: {e}")
                     event.error_message = str(e)
-                    event.status = EventStatus.FAILED
+                    self._set_status(event, EventStatus.FAILED)
                     return
             
-            event.status = EventStatus.COMPLETED
-            logger.debug(f"Successfully processed event {event.id}")
+            self._set_status(event, EventStatus.COMPLETED)
+            logger.debug("Successfully processed event %s", event.id)
             
         except Exception as e:
             logger.error(f"Error processing event {event.id}: {e}")
-            event.status = EventStatus.FAILED
+            self._set_status(event, EventStatus.FAILED)
             event.error_message = str(e)
     
     async def _validate_event(self, event: Event) -> bool:
@@ -218,35 +374,30 @@ class EventManager:
     
     def get_events_by_status(self, status: EventStatus) -> List[Event]:
         """Get events by status"""
-        return [event for event in self.events.values() 
-                if event.status == status]
+        return list(self._events.by_status.get(status, {}).values())
     
     def get_events_by_type(self, event_type: EventType) -> List[Event]:
         """Get events by type"""
-        return [event for event in self.events.values() 
-                if event.type == event_type]
+        return list(self._events.by_type.get(event_type, {}).values())
     
     def get_events_by_device(self, device_id: str) -> List[Event]:
         """Get events by device"""
-        return [event for event in self.events.values() 
-                if event.device_id == device_id]
+        return list(self._events.by_device.get(device_id, {}).values())
     
     def get_events_by_work_order(self, work_order_id: str) -> List[Event]:
         """Get events by work order"""
-        return [event for event in self.events.values() 
-                if event.work_order_id == work_order_id]
+        return list(self._events.by_work_order.get(work_order_id, {}).values())
     
     def get_event_statistics(self) -> Dict[str, Any]:
         """Get event processing statistics"""
         total_events = len(self.events)
         
-        status_counts = {}
-        for status in EventStatus:
-            status_counts[status.value] = len(self.get_events_by_status(status))
+        # Bucket sizes of the indexes, no pass over the events
+        by_status = self._events.by_status
+        status_counts = {value: len(by_status.get(status, ())) for status, value in _STATUS_VALUES.items()}
         
-        type_counts = {}
-        for event_type in EventType:
-            type_counts[event_type.value] = len(self.get_events_by_type(event_type))
+        by_type = self._events.by_type
+        type_counts = {value: len(by_type.get(event_type, ())) for event_type, value in _EVENT_TYPE_VALUES.items()}
         
         return {
             "total_events": total_events,
@@ -259,35 +410,33 @@ class EventManager:
     async def retry_failed_events(self, max_retries: int = 3):
         """Retry failed events"""
         failed_events = self.get_events_by_status(EventStatus.FAILED)
+        retried = []
         
         for event in failed_events:
             retry_count = event.metadata.get('retry_count', 0)
             
             if retry_count < max_retries:
                 event.metadata['retry_count'] = retry_count + 1
-                event.status = EventStatus.PENDING
+                self._set_status(event, EventStatus.PENDING)
                 event.error_message = None
                 
+                # put() only suspends when the queue is full, so queueing
+                # the batch costs no event loop round trips
                 try:
                     await self.processing_queue.put(event)
-                    logger.info(f"Retrying failed event {event.id}")
+                    retried.append(event.id)
                 except asyncio.QueueFull:
                     logger.error("Cannot retry event - queue is full")
+        
+        if retried:
+            logger.info("Retrying %d failed events", len(retried))
+            logger.debug("Retried events: %s", retried)
     
     def clear_old_events(self, max_age_hours: int = 24):
         """Clear old completed events"""
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-        
-        events_to_remove = []
-        
-        for event_id, event in self.events.items():
-            if (event.status == EventStatus.COMPLETED and 
-                current_time - event.timestamp > max_age_seconds):
-                events_to_remove.append(event_id)
+        cutoff = time.time() - max_age_hours * 3600
         
-        for event_id in events_to_remove:
-            del self.events[event_id]
+        events_to_remove = self._events.expire(cutoff, EventStatus.COMPLETED)
         
         if events_to_remove:
             logger.info(f"Cleared {len(events_to_remove)} old events")
@@ -312,8 +461,8 @@ class EventManager:
             
             # Convert to dictionary
             event_dict = asdict(event)
-            event_dict['type'] = event.type.value
-            event_dict['status'] = event.status.value
+            event_dict['type'] = _EVENT_TYPE_VALUES[event.type]
+            event_dict['status'] = _STATUS_VALUES[event.status]
             filtered_events.append(event_dict)
         
         return filtered_events
@@ -4,14 +4,98 @@ Helper utilities for IoT Box
 Provides common helper functions and utilities.
 """
 
+import re
 import time
 import hashlib
+from collections import OrderedDict
 import uuid
 import json
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from datetime import datetime, timezone
 import asyncio
+import concurrent.futures
 import functools
+import os
+import yaml
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+_UTC = timezone.utc
+_YAML_CACHE: Dict[str, Tuple[float, Any]] = {}
+_TIMEOUT_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="timeout_after")
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+_DURATION_UNITS = ((86400, 'd'), (3600, 'h'), (60, 'm'))
+_DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Canonical (8-4-4-4-12) or bare 32-digit hex UUID, as accepted by uuid.UUID
+_UUID_RE = re.compile(
+    r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}'
+)
+
+
+# Monotonic clock for TTL arithmetic, immune to wall-clock (NTP) jumps
+_now = time.monotonic
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl seconds after being set.
+    
+    A per-entry ttl can be given to set() to override the default. The
+    timer defaults to the monotonic clock and must never go backwards.
+    """
+    
+    def __init__(self, ttl: float, maxsize: int = 10000, timer: Callable[[], float] = _now):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._timer = timer
+        # key -> (expiry time, value)
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the live value for key, dropping it if expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if self._timer() < entry[0]:
+            self._data.move_to_end(key)
+            return entry[1]
+        del self._data[key]
+        return default
+    
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None):
+        """Store value under key, evicting the least recently used entry when full"""
+        self._data[key] = (self._timer() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Any, default: Any = None) -> Any:
+        """Remove key and return its value regardless of expiry"""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+    
+    def expire(self) -> int:
+        """Drop every expired entry and return how many were removed"""
+        now = self._timer()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+    
+    def clear(self):
+        """Remove all entries"""
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
 
 
 def generate_id(prefix: str = "") -> str:
@@ -53,15 +137,48 @@ def get_current_timestamp() -> float:
     return time.time()
 
 
-def format_timestamp(timestamp: float, format_str: str = "%Y-%m-%d %H:%M:%S") -> str:
+def format_timestamp(timestamp: float, format_str: str = _DEFAULT_TIMESTAMP_FORMAT) -> str:
     """Format timestamp to readable string"""
-    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(format_str)
+    dt = datetime.fromtimestamp(timestamp, tz=_UTC)
+    if format_str == _DEFAULT_TIMESTAMP_FORMAT:
+        # Fast path: skip strftime format-string interpretation
+        return (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+                f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}")
+    return dt.strftime(format_str)
 
 
-def parse_timestamp(timestamp_str: str, format_str: str = "%Y-%m-%d %H:%M:%S") -> float:
+def parse_timestamp(timestamp_str: str, format_str: str = _DEFAULT_TIMESTAMP_FORMAT) -> float:
     """Parse timestamp string to Unix timestamp"""
+    if format_str == _DEFAULT_TIMESTAMP_FORMAT and len(timestamp_str) == 19:
+        # Fast path: fixed-width fields, no strptime; malformed input falls through
+        fields = (timestamp_str[0:4], timestamp_str[5:7], timestamp_str[8:10],
+                  timestamp_str[11:13], timestamp_str[14:16], timestamp_str[17:19])
+        separators = timestamp_str[4] + timestamp_str[7] + timestamp_str[10] + timestamp_str[13] + timestamp_str[16]
+        digits = ''.join(fields)
+        if separators == "-- ::" and digits.isascii() and digits.isdigit():
+            try:
+                return datetime(*map(int, fields), tzinfo=_UTC).timestamp()
+            except ValueError:
+                pass
     dt = datetime.strptime(timestamp_str, format_str)
-    return dt.replace(tzinfo=timezone.utc).timestamp()
+    return dt.replace(tzinfo=_UTC).timestamp()
+
+
+def load_yaml_config(config_path: str) -> Any:
+    """Load a YAML file, reusing the parsed result until the file's mtime changes.
+    
+    The returned object is shared between callers and must not be mutated.
+    """
+    mtime = os.stat(config_path).st_mtime
+    cached = _YAML_CACHE.get(config_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    with open(config_path, 'r') as file:
+        config = yaml.load(file, Loader=_YamlLoader)
+    
+    _YAML_CACHE[config_path] = (mtime, config)
+    return config
 
 
 def deep_merge_dicts(dict1: Dict, dict2: Dict) -> Dict:
@@ -77,25 +194,69 @@ def deep_merge_dicts(dict1: Dict, dict2: Dict) -> Dict:
     return result
 
 
-def safe_json_loads(json_str: str, default: Any = None) -> Any:
-    """Safely load JSON string with default value"""
+if orjson is not None:
+    def _json_loads(data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+    
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Integers beyond 64 bits and similar cases orjson rejects
+            return json.dumps(obj, default=str).encode()
+    
+    def _json_dumps(obj: Any) -> str:
+        return _json_dumps_bytes(obj).decode()
+else:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, default=str)
+    
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return _json_dumps(obj).encode()
+
+
+def safe_json_loads(json_str: Union[str, bytes], default: Any = None) -> Any:
+    """Safely load JSON string (or UTF-8 bytes, decoded natively) with default value"""
     try:
-        return json.loads(json_str)
-    except (json.JSONDecodeError, TypeError):
+        return _json_loads(json_str)
+    except (ValueError, TypeError):
         return default
 
 
 def safe_json_dumps(obj: Any, default: str = "{}") -> str:
     """Safely dump object to JSON string with default value"""
     try:
-        return json.dumps(obj, default=str)
+        return _json_dumps(obj)
+    except (TypeError, ValueError):
+        return default
+
+
+def safe_json_dumps_bytes(obj: Any, default: bytes = b"{}") -> bytes:
+    """Safely dump object to UTF-8 JSON bytes, ready to send as a response body"""
+    try:
+        return _json_dumps_bytes(obj)
     except (TypeError, ValueError):
         return default
 
 
+def iter_chunks(lst: Sequence[Any], chunk_size: int) -> Iterator[Sequence[Any]]:
+    """Lazily yield successive chunks of specified size"""
+    for i in range(0, len(lst), chunk_size):
+        yield lst[i:i + chunk_size]
+
+
 def chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
     """Split list into chunks of specified size"""
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+    return list(iter_chunks(lst, chunk_size))
+
+
+def chunk_bytes(data: Union[bytes, bytearray, memoryview], chunk_size: int) -> Iterator[memoryview]:
+    """Yield zero-copy memoryview chunks of a byte payload"""
+    view = memoryview(data)
+    for i in range(0, len(view), chunk_size):
+        yield view[i:i + chunk_size]
 
 
 def flatten_dict(d: Dict, parent_key: str = '', sep: str = '.') -> Dict:
@@ -169,20 +330,15 @@ def timeout_after(seconds: float):
         
         @functools.wraps(func)
         def sync_wrapper(*args, **kwargs):
-            import signal
-            
-            def timeout_handler(signum, frame):
-                raise TimeoutError(f"Function {func.__name__} timed out after {seconds} seconds")
-            
-            old_handler = signal.signal(signal.SIGALRM, timeout_handler)
-            signal.alarm(int(seconds))
-            
+            # Works from any thread and honours sub-second timeouts; the
+            # worker cannot be interrupted, so a timed-out call runs on in
+            # the background while the caller gets the TimeoutError.
+            future = _TIMEOUT_POOL.submit(func, *args, **kwargs)
             try:
-                result = func(*args, **kwargs)
-                return result
-            finally:
-                signal.alarm(0)
-                signal.signal(signal.SIGALRM, old_handler)
+                return future.result(timeout=seconds)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise TimeoutError(f"Function {func.__name__} timed out after {seconds} seconds")
         
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
@@ -194,26 +350,18 @@ def timeout_after(seconds: float):
 
 def format_bytes(bytes_value: int) -> str:
     """Format bytes to human readable string"""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_value < 1024.0:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024.0
-    return f"{bytes_value:.1f} PB"
+    # Unit index is floor(log1024(value)), read straight off the bit length
+    whole = int(bytes_value)
+    index = min(len(_BYTE_UNITS) - 1, (whole.bit_length() - 1) // 10) if whole > 0 else 0
+    return f"{bytes_value / (1 << (index * 10)):.1f} {_BYTE_UNITS[index]}"
 
 
 def format_duration(seconds: float) -> str:
     """Format duration in seconds to human readable string"""
-    if seconds < 60:
-        return f"{seconds:.1f}s"
-    elif seconds < 3600:
-        minutes = seconds / 60
-        return f"{minutes:.1f}m"
-    elif seconds < 86400:
-        hours = seconds / 3600
-        return f"{hours:.1f}h"
-    else:
-        days = seconds / 86400
-        return f"{days:.1f}d"
+    for unit_seconds, suffix in _DURATION_UNITS:
+        if seconds >= unit_seconds:
+            return f"{seconds / unit_seconds:.1f}{suffix}"
+    return f"{seconds:.1f}s"
 
 
 def calculate_percentage(part: float, total: float) -> float:
@@ -230,11 +378,7 @@ def clamp(value: float, min_value: float, max_value: float) -> float:
 
 def is_valid_uuid(uuid_string: str) -> bool:
     """Check if string is valid UUID"""
-    try:
-        uuid.UUID(uuid_string)
-        return True
-    except ValueError:
-        return False
+    return isinstance(uuid_string, str) and _UUID_RE.fullmatch(uuid_string) is not None
 
 
 def extract_numbers(text: str) -> List[float]:
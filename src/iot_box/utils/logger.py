@@ -4,12 +4,144 @@ Logging utilities for IoT Box
 Provides centralized logging configuration and utilities.
 """
 
+import asyncio
+import functools
 import logging
+import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from loguru import logger as loguru_logger
-import yaml
+
+from .helpers import load_yaml_config
+
+
+_LOGGING_FILE = logging.__file__
+
+# Frames between InterceptHandler.emit and the caller of Logger.info() & co:
+# emit <- Handler.handle <- Logger.callHandlers <- Logger.handle <- Logger._log <- Logger.info
+_INTERCEPT_DEPTH = 6
+
+# Most buffers a single writev() accepts
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+
+
+@functools.lru_cache(maxsize=16)
+def _loguru_level(levelname: str, levelno: int):
+    """Map a standard logging level to its loguru equivalent"""
+    try:
+        return loguru_logger.level(levelname).name
+    except ValueError:
+        return levelno
+
+
+class InterceptHandler(logging.Handler):
+    """Forward standard logging records to loguru"""
+    
+    def emit(self, record):
+        level = _loguru_level(record.levelname, record.levelno)
+        
+        # Only walks further for module-level helpers such as logging.info()
+        frame, depth = sys._getframe(_INTERCEPT_DEPTH), _INTERCEPT_DEPTH
+        while frame and frame.f_code.co_filename == _LOGGING_FILE:
+            frame = frame.f_back
+            depth += 1
+        
+        loguru_logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+class AuditWriter:
+    """Append-only audit file written in batches by a background task.
+    
+    Callers queue preformatted lines without blocking or touching the
+    logging framework's locks. The writer task collects whatever is queued,
+    up to batch_bytes, and hands it to the kernel with a single writev().
+    The file is opened with O_DSYNC where available, so each batch is on
+    disk when the write returns.
+    """
+    
+    def __init__(self, path: str, batch_bytes: int = 64 * 1024, max_queue: int = 10000):
+        self.path = Path(path)
+        self.batch_bytes = batch_bytes
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._fd: Optional[int] = None
+    
+    def write(self, line: bytes):
+        """Queue a line for writing; must be called from the event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def aclose(self):
+        """Write out everything queued and close the file"""
+        if self._task is not None and not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    async def _run(self):
+        """Drain the queue, one writev per batch"""
+        if self._fd is None:
+            self._fd = await asyncio.to_thread(self._open)
+        
+        while True:
+            line = await self._queue.get()
+            if line is None:
+                return
+            
+            batch = [line]
+            size = len(line)
+            closing = False
+            while size < self.batch_bytes and len(batch) < _IOV_MAX and not self._queue.empty():
+                line = self._queue.get_nowait()
+                if line is None:
+                    closing = True
+                    break
+                batch.append(line)
+                size += len(line)
+            
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except OSError as e:
+                logging.getLogger(__name__).error("Error writing audit file %s: %s", self.path, e)
+            
+            if closing:
+                return
+    
+    def _open(self) -> int:
+        """Open the audit file for appending, creating its directory"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_DSYNC', 0)
+        return os.open(self.path, flags, 0o644)
+    
+    def _write_batch(self, batch: List[bytes]):
+        """Write a batch in full, resuming after partial writes"""
+        while batch:
+            if hasattr(os, 'writev'):
+                written = os.writev(self._fd, batch)
+            else:
+                written = os.write(self._fd, b"".join(batch))
+            
+            while batch and written >= len(batch[0]):
+                written -= len(batch[0])
+                batch.pop(0)
+            if batch and written:
+                batch[0] = batch[0][written:]
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -24,8 +156,7 @@ def setup_logging(config_path: str = "config/config.yaml",
     
     try:
         # Load configuration
-        with open(config_path, 'r') as file:
-            config = yaml.safe_load(file)
+        config = load_yaml_config(config_path) or {}
         
         logging_config = config.get('logging', {})
         log_level = logging_config.get('level', log_level)
@@ -62,23 +193,6 @@ def setup_logging(config_path: str = "config/config.yaml",
             compression="zip"
         )
     
-    # Configure standard logging to use loguru
-    class InterceptHandler(logging.Handler):
-        def emit(self, record):
-            try:
-                level = loguru_logger.level(record.levelname).name
-            except ValueError:
-                level = record.levelno
-            
-            frame, depth = sys._getframe(6), 6
-            while frame and frame.f_code.co_filename == logging.__file__:
-                frame = frame.f_back
-                depth += 1
-            
-            loguru_logger.opt(depth=depth, exception=record.exc_info).log(
-                level, record.getMessage()
-            )
-    
     # Replace all existing handlers
     logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
     
@@ -90,25 +204,34 @@ def setup_logging(config_path: str = "config/config.yaml",
     return loguru_logger
 
 
+_audit_logger: Optional[logging.Logger] = None
+
+
 def get_audit_logger():
     """Get audit logger for security events"""
+    global _audit_logger
+    if _audit_logger is not None:
+        return _audit_logger
+    
     audit_logger = logging.getLogger("audit")
     audit_logger.setLevel(logging.INFO)
     
-    # Add file handler for audit logs
-    audit_file = Path("logs/audit.log")
-    audit_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    handler = logging.FileHandler(audit_file)
-    handler.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter(
-        "%(asctime)s - AUDIT - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-    
-    audit_logger.addHandler(handler)
+    # Add file handler for audit logs (only once per process)
+    if not any(isinstance(h, logging.FileHandler) for h in audit_logger.handlers):
+        audit_file = Path("logs/audit.log")
+        audit_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        handler = logging.FileHandler(audit_file)
+        handler.setLevel(logging.INFO)
+        
+        formatter = logging.Formatter(
+            "%(asctime)s - AUDIT - %(levelname)s - %(message)s"
+        )
+        handler.setFormatter(formatter)
+        
+        audit_logger.addHandler(handler)
     
+    _audit_logger = audit_logger
     return audit_logger
 
 
@@ -119,18 +242,26 @@ def log_security_event(event_type: str,
                       details: Optional[dict] = None):
     """Log a security event"""
     audit_logger = get_audit_logger()
+    if not audit_logger.isEnabledFor(logging.INFO):
+        return
     
-    message = f"SECURITY_EVENT: {event_type}"
+    # Message is formatted lazily by the logging framework
+    parts = ["SECURITY_EVENT: %s"]
+    args = [event_type]
     if username:
-        message += f" | User: {username}"
+        parts.append("User: %s")
+        args.append(username)
     if device_id:
-        message += f" | Device: {device_id}"
+        parts.append("Device: %s")
+        args.append(device_id)
     if ip_address:
-        message += f" | IP: {ip_address}"
+        parts.append("IP: %s")
+        args.append(ip_address)
     if details:
-        message += f" | Details: {details}"
+        parts.append("Details: %s")
+        args.append(details)
     
-    audit_logger.info(message)
+    audit_logger.info(" | ".join(parts), *args)
 
 
 def log_scan_event(device_id: str, 
@@ -140,13 +271,15 @@ def log_scan_event(device_id: str,
                   status: str = "success"):
     """Log a scan event"""
     logger = get_logger("scan_events")
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
-    message = f"SCAN_EVENT: {scan_type} | Device: {device_id} | Data: {scan_data}"
     if work_order_id:
-        message += f" | WorkOrder: {work_order_id}"
-    message += f" | Status: {status}"
-    
-    logger.info(message)
+        logger.info("SCAN_EVENT: %s | Device: %s | Data: %s | WorkOrder: %s | Status: %s",
+                    scan_type, device_id, scan_data, work_order_id, status)
+    else:
+        logger.info("SCAN_EVENT: %s | Device: %s | Data: %s | Status: %s",
+                    scan_type, device_id, scan_data, status)
 
 
 def log_odoo_event(event_type: str,
@@ -156,14 +289,21 @@ def log_odoo_event(event_type: str,
                   error_message: Optional[str] = None):
     """Log an Odoo integration event"""
     logger = get_logger("odoo_events")
+    if not logger.isEnabledFor(logging.INFO):
+        return
     
-    message = f"ODOO_EVENT: {event_type}"
+    parts = ["ODOO_EVENT: %s"]
+    args = [event_type]
     if work_order_id:
-        message += f" | WorkOrder: {work_order_id}"
+        parts.append("WorkOrder: %s")
+        args.append(work_order_id)
     if component_id:
-        message += f" | Component: {component_id}"
-    message += f" | Status: {status}"
+        parts.append("Component: %s")
+        args.append(component_id)
+    parts.append("Status: %s")
+    args.append(status)
     if error_message:
-        message += f" | Error: {error_message}"
+        parts.append("Error: %s")
+        args.append(error_message)
     
-    logger.info(message)
+    logger.info(" | ".join(parts), *args)
@@ -8,6 +8,24 @@ import re
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from .helpers import safe_json_loads
+
+_INVALID_JSON = object()
+
+SCAN_EVENT_REQUIRED_FIELDS = ('device_id', 'scan_data', 'scan_type')
+SCAN_TYPES = ('barcode', 'rfid')
+
+_IPV6_RE = re.compile(r'^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$')
+
+_MIN_TIMESTAMP = 1577836800  # 2020-01-01
+_MAX_TIMESTAMP = 1893456000  # 2030-01-01
+
+# Scan formats, compiled once at import
+_BARCODE_RE = re.compile(r'[A-Za-z0-9\-\.]{3,50}')
+_BARCODE_STRIP_RE = re.compile(r'[^A-Za-z0-9\-\.]')
+_DIGIT_RE = re.compile(r'\d')
+_RFID_RE = re.compile(r'^[0-9A-Fa-f]+$')
+
 
 def validate_scan_data(scan_data: str, scan_type: str) -> bool:
     """Validate scan data based on type"""
@@ -36,15 +54,19 @@ def validate_barcode(barcode: str) -> bool:
     if not barcode:
         return False
     
+    # Already clean (the usual case): one match covers charset and length
+    if _BARCODE_RE.fullmatch(barcode):
+        return _DIGIT_RE.search(barcode) is not None
+    
     # Remove any non-alphanumeric characters except common barcode separators
-    clean_barcode = re.sub(r'[^A-Za-z0-9\-\.]', '', barcode)
+    clean_barcode = _BARCODE_STRIP_RE.sub('', barcode)
     
     # Check length (typical barcodes are 8-14 digits)
     if len(clean_barcode) < 3 or len(clean_barcode) > 50:
         return False
     
     # Check if it contains at least some digits
-    if not re.search(r'\d', clean_barcode):
+    if not _DIGIT_RE.search(clean_barcode):
         return False
     
     return True
@@ -55,15 +77,31 @@ def validate_rfid(rfid: str) -> bool:
     if not rfid:
         return False
     
-    # RFID tags are typically hexadecimal
-    if not re.match(r'^[0-9A-Fa-f]+$', rfid):
-        return False
-    
     # Check length (typical RFID tags are 8-32 hex characters)
     if len(rfid) < 8 or len(rfid) > 32:
         return False
     
-    return True
+    # RFID tags are typically hexadecimal
+    return _RFID_RE.match(rfid) is not None
+
+
+def classify_scan(scan_data: str) -> Optional[str]:
+    """Infer the scan type ('barcode' or 'rfid') from the scanned label.
+    
+    Hex labels of RFID length that contain letters are taken as RFID tags;
+    all-digit labels (EAN/UPC) and other valid barcodes as barcodes.
+    Returns None when the label matches neither format.
+    """
+    if not scan_data or not isinstance(scan_data, str):
+        return None
+    
+    if not scan_data.isdigit() and validate_rfid(scan_data):
+        return 'rfid'
+    
+    if validate_barcode(scan_data):
+        return 'barcode'
+    
+    return None
 
 
 def validate_work_order(work_order_id: str) -> bool:
@@ -131,22 +169,15 @@ def validate_ip_address(ip_address: str) -> bool:
     if not ip_address:
         return False
     
-    # IPv4 pattern
-    ipv4_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if re.match(ipv4_pattern, ip_address):
-        # Check each octet is 0-255
-        octets = ip_address.split('.')
-        for octet in octets:
-            if not 0 <= int(octet) <= 255:
-                return False
-        return True
+    # IPv4: four dotted decimal octets 0-255, checked with str methods only
+    if ip_address.count('.') == 3:
+        return all(
+            1 <= len(octet) <= 3 and octet.isascii() and octet.isdigit() and int(octet) <= 255
+            for octet in ip_address.split('.')
+        )
     
     # IPv6 pattern (basic)
-    ipv6_pattern = r'^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$'
-    if re.match(ipv6_pattern, ip_address):
-        return True
-    
-    return False
+    return _IPV6_RE.match(ip_address) is not None
 
 
 def validate_mac_address(mac_address: str) -> bool:
@@ -161,14 +192,11 @@ def validate_mac_address(mac_address: str) -> bool:
 
 def validate_timestamp(timestamp: float) -> bool:
     """Validate timestamp (Unix timestamp)"""
-    if not isinstance(timestamp, (int, float)):
-        return False
-    
     # Check if timestamp is reasonable (between 2020 and 2030)
-    min_timestamp = 1577836800  # 2020-01-01
-    max_timestamp = 1893456000  # 2030-01-01
-    
-    return min_timestamp <= timestamp <= max_timestamp
+    try:
+        return _MIN_TIMESTAMP <= timestamp <= _MAX_TIMESTAMP
+    except TypeError:
+        return False
 
 
 def validate_config(config: Dict[str, Any], required_fields: List[str]) -> bool:
@@ -206,12 +234,7 @@ def validate_json_data(data: str) -> bool:
     if not data:
         return False
     
-    try:
-        import json
-        json.loads(data)
-        return True
-    except (json.JSONDecodeError, TypeError):
-        return False
+    return safe_json_loads(data, _INVALID_JSON) is not _INVALID_JSON
 
 
 def validate_email(email: str) -> bool:
@@ -271,8 +294,7 @@ def validate_scan_event_data(event_data: Dict[str, Any]) -> Dict[str, Any]:
     warnings = []
     
     # Required fields
-    required_fields = ['device_id', 'scan_data', 'scan_type']
-    missing_fields = validate_required_fields(event_data, required_fields)
+    missing_fields = validate_required_fields(event_data, SCAN_EVENT_REQUIRED_FIELDS)
     
     if missing_fields:
         errors.extend([f"Missing required field: {field}" for field in missing_fields])
@@ -286,7 +308,7 @@ def validate_scan_event_data(event_data: Dict[str, Any]) -> Dict[str, Any]:
         errors.append("Invalid scan_data format")
     
     # Validate scan_type
-    if 'scan_type' in event_data and event_data['scan_type'] not in ['barcode', 'rfid']:
+    if 'scan_type' in event_data and event_data['scan_type'] not in SCAN_TYPES:
         errors.append("Invalid scan_type (must be 'barcode' or 'rfid')")
     
     # Validate work_order_id if present
@@ -306,3 +328,77 @@ def validate_scan_event_data(event_data: Dict[str, Any]) -> Dict[str, Any]:
         'errors': errors,
         'warnings': warnings
     }
+
+
+def _extract_column(events: List[Dict[str, Any]], field: str, skip_empty: bool = False) -> List[tuple]:
+    """Extract (index, value) pairs for one field across a batch of events"""
+    return [
+        (index, event_data[field])
+        for index, event_data in enumerate(events)
+        if field in event_data and (event_data[field] or not skip_empty)
+    ]
+
+
+def _validate_column(column: List[tuple], validator, results: List[List[str]],
+                     message: str, memoize: bool = True):
+    """Run one validator down a column, appending message to failing events"""
+    seen: Dict[Any, bool] = {}
+    
+    for index, value in column:
+        if memoize:
+            try:
+                valid = seen[value]
+            except KeyError:
+                valid = seen[value] = validator(value)
+            except TypeError:  # unhashable value
+                valid = validator(value)
+        else:
+            valid = validator(value)
+        
+        if not valid:
+            results[index].append(message)
+
+
+def validate_scan_event_data_batch(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate a batch of scan events column by column.
+    
+    Returns one result per event, identical to validate_scan_event_data. Each
+    field is checked across the whole batch in turn, so values repeated within
+    a batch (device, scan type, work order, operator) are only validated once.
+    """
+    errors: List[List[str]] = [[] for _ in events]
+    warnings: List[List[str]] = [[] for _ in events]
+    
+    for index, event_data in enumerate(events):
+        for field in validate_required_fields(event_data, SCAN_EVENT_REQUIRED_FIELDS):
+            errors[index].append(f"Missing required field: {field}")
+    
+    _validate_column(_extract_column(events, 'device_id'), validate_device_id,
+                     errors, "Invalid device_id format")
+    
+    # scan_data validation depends on the event's scan_type
+    scan_column = [
+        (index, (event_data['scan_data'], event_data.get('scan_type', '')))
+        for index, event_data in enumerate(events)
+        if 'scan_data' in event_data
+    ]
+    _validate_column(scan_column, lambda pair: validate_scan_data(*pair),
+                     errors, "Invalid scan_data format")
+    
+    _validate_column(_extract_column(events, 'scan_type'), lambda scan_type: scan_type in SCAN_TYPES,
+                     errors, "Invalid scan_type (must be 'barcode' or 'rfid')")
+    _validate_column(_extract_column(events, 'work_order_id', skip_empty=True), validate_work_order,
+                     warnings, "Invalid work_order_id format")
+    _validate_column(_extract_column(events, 'operator_id', skip_empty=True), validate_operator_id,
+                     warnings, "Invalid operator_id format")
+    _validate_column(_extract_column(events, 'timestamp'), validate_timestamp,
+                     warnings, "Invalid timestamp format", memoize=False)
+    
+    return [
+        {
+            'valid': not event_errors,
+            'errors': event_errors,
+            'warnings': event_warnings
+        }
+        for event_errors, event_warnings in zip(errors, warnings)
+    ]
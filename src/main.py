@@ -7,22 +7,82 @@ Entry point for the IoT Box Odoo integration system.
 import asyncio
 import logging
 import signal
-import sys
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 import yaml
 import argparse
+import uvicorn
 
 from iot_box.core.device_manager import DeviceManager
-from iot_box.core.event_manager import EventManager
+from iot_box.core.event_manager import EventManager, EventType
 from iot_box.core.buffer_manager import BufferManager
 from iot_box.core.security_manager import SecurityManager
+from iot_box.utils.helpers import load_yaml_config
 from iot_box.utils.logger import setup_logging, get_logger
+from odoo_integration.models.component import ODOO_RPC_ERRORS
 from odoo_integration.services.sync_service import SyncService
 from web_interface.app import create_app
 
 logger = get_logger(__name__)
 
+# Scan batching: bounded backlog, batch size adapts between 1 and the max
+SCAN_QUEUE_SIZE = 1000
+SCAN_BATCH_MAX = 64
+SCAN_BATCH_MAX_DELAY = 0.05  # seconds to wait for a batch to fill
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """Application settings, flattened once from the YAML configuration"""
+    log_level: str = 'INFO'
+    server_host: str = '0.0.0.0'
+    server_port: int = 8080
+    secret_key: str = 'default-secret-key'
+    encryption_key: Optional[str] = None
+    buffer_size: int = 1000
+    sync_interval: int = 60
+    max_retries: int = 3
+    odoo: Dict[str, Any] = field(default_factory=dict)
+    
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "AppConfig":
+        """Build settings from a parsed config.yaml"""
+        iot_box_config = config.get('iot_box', {})
+        server_config = iot_box_config.get('server', {})
+        security_config = iot_box_config.get('security', {})
+        buffer_config = iot_box_config.get('offline', {})
+        
+        return cls(
+            log_level=config.get('logging', {}).get('level', 'INFO'),
+            server_host=server_config.get('host', '0.0.0.0'),
+            server_port=server_config.get('port', 8080),
+            secret_key=security_config.get('secret_key', 'default-secret-key'),
+            encryption_key=security_config.get('encryption_key'),
+            buffer_size=buffer_config.get('buffer_size', 1000),
+            sync_interval=buffer_config.get('sync_interval', 60),
+            max_retries=buffer_config.get('max_retries', 3),
+            odoo=config.get('odoo', {})
+        )
+
+
+@dataclass
+class ScanRequest:
+    """Scan event queued for batch processing, with its pending result"""
+    event: Any
+    future: asyncio.Future
+
+
+class EmbeddedWebServer(uvicorn.Server):
+    """uvicorn server run as a task on the application's event loop.
+    
+    Signal handling is left to the application so that shutdown goes
+    through IoTBoxApplication.stop().
+    """
+    
+    def install_signal_handlers(self):
+        pass
+
 
 class IoTBoxApplication:
     """Main IoT Box application class"""
@@ -30,7 +90,9 @@ class IoTBoxApplication:
     def __init__(self, config_path: str = "config/config.yaml"):
         self.config_path = config_path
         self.config = {}
+        self.settings = AppConfig()
         self.running = False
+        self._stop_event = asyncio.Event()
         
         # Core managers
         self.device_manager: Optional[DeviceManager] = None
@@ -41,6 +103,12 @@ class IoTBoxApplication:
         
         # Web application
         self.web_app = None
+        self.web_server: Optional[uvicorn.Server] = None
+        self._web_task: Optional[asyncio.Task] = None
+        
+        # Scan processing
+        self._scan_queue: asyncio.Queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        self._scan_worker_task: Optional[asyncio.Task] = None
         
     async def initialize(self):
         """Initialize the application"""
@@ -49,7 +117,7 @@ class IoTBoxApplication:
             await self._load_config()
             
             # Setup logging
-            setup_logging(self.config_path, self.config.get('logging', {}).get('level', 'INFO'))
+            setup_logging(self.config_path, self.settings.log_level)
             
             logger.info("Initializing IoT Box Application")
             
@@ -71,8 +139,9 @@ class IoTBoxApplication:
     async def _load_config(self):
         """Load configuration from YAML file"""
         try:
-            with open(self.config_path, 'r') as file:
-                self.config = yaml.safe_load(file)
+            # Parsed off the event loop; the parse is cached until the file changes
+            self.config = await asyncio.to_thread(load_yaml_config, self.config_path) or {}
+            self.settings = AppConfig.from_dict(self.config)
             
             logger.info(f"Loaded configuration from {self.config_path}")
             
@@ -87,10 +156,9 @@ class IoTBoxApplication:
         """Initialize core managers"""
         try:
             # Initialize security manager
-            security_config = self.config.get('iot_box', {}).get('security', {})
             self.security_manager = SecurityManager(
-                secret_key=security_config.get('secret_key', 'default-secret-key'),
-                encryption_key=security_config.get('encryption_key'),
+                secret_key=self.settings.secret_key,
+                encryption_key=self.settings.encryption_key,
                 policy=None  # Use default policy for now
             )
             
@@ -101,16 +169,14 @@ class IoTBoxApplication:
             self.event_manager = EventManager()
             
             # Initialize buffer manager
-            buffer_config = self.config.get('iot_box', {}).get('offline', {})
             self.buffer_manager = BufferManager(
-                buffer_size=buffer_config.get('buffer_size', 1000),
-                sync_interval=buffer_config.get('sync_interval', 60),
-                max_retries=buffer_config.get('max_retries', 3)
+                buffer_size=self.settings.buffer_size,
+                sync_interval=self.settings.sync_interval,
+                max_retries=self.settings.max_retries
             )
             
             # Initialize sync service
-            odoo_config = self.config.get('odoo', {})
-            self.sync_service = SyncService(odoo_config)
+            self.sync_service = SyncService(self.settings.odoo)
             
             logger.info("Core managers initialized")
             
@@ -127,7 +193,8 @@ class IoTBoxApplication:
                 event_manager=self.event_manager,
                 buffer_manager=self.buffer_manager,
                 security_manager=self.security_manager,
-                sync_service=self.sync_service
+                sync_service=self.sync_service,
+                loop=asyncio.get_running_loop()
             )
             
             logger.info("Web interface initialized")
@@ -139,29 +206,15 @@ class IoTBoxApplication:
     async def _setup_event_handlers(self):
         """Setup event handlers"""
         try:
-            # Register scan event handler
-            self.event_manager.register_handler(
-                self.event_manager.EventType.SCAN,
-                self._handle_scan_event
+            handlers = (
+                (EventType.SCAN, self._handle_scan_event),
+                (EventType.WORK_ORDER_SET, self._handle_work_order_event),
+                (EventType.COMPONENT_CONSUMED, self._handle_component_consumption_event),
+                (EventType.ERROR, self._handle_error_event),
             )
             
-            # Register work order event handler
-            self.event_manager.register_handler(
-                self.event_manager.EventType.WORK_ORDER_SET,
-                self._handle_work_order_event
-            )
-            
-            # Register component consumption handler
-            self.event_manager.register_handler(
-                self.event_manager.EventType.COMPONENT_CONSUMED,
-                self._handle_component_consumption_event
-            )
-            
-            # Register error handler
-            self.event_manager.register_handler(
-                self.event_manager.EventType.ERROR,
-                self._handle_error_event
-            )
+            for event_type, handler in handlers:
+                self.event_manager.register_handler(event_type, handler)
             
             logger.info("Event handlers registered")
             
@@ -170,68 +223,165 @@ class IoTBoxApplication:
             raise
     
     async def _handle_scan_event(self, event):
-        """Handle scan events"""
+        """Handle scan events, raising when the scan fails so the event is marked failed"""
+        future = await self.submit_scan(event)
+        # Wait without awaiting the future itself: if it is cancelled, awaiting it
+        # would raise CancelledError in the event worker
+        await asyncio.wait([future])
+        if future.cancelled():
+            raise RuntimeError(f"Scan {event.scan_data} was not processed")
+        
+        success, message = future.result()
+        if not success:
+            raise RuntimeError(message)
+    
+    async def submit_scan(self, event) -> asyncio.Future:
+        """Queue a scan event; the returned future resolves to (success, message)"""
+        future = asyncio.get_running_loop().create_future()
+        # Waits only when the backlog is full, pushing back on the event workers
+        await self._scan_queue.put(ScanRequest(event, future))
+        return future
+    
+    async def _scan_worker(self):
+        """Drain the scan queue in adaptively sized batches"""
+        loop = asyncio.get_running_loop()
+        batch_size = 1
+        
+        while True:
+            batch = [await self._scan_queue.get()]
+            # Everything taken off the queue, including scans gathered while the
+            # batch fills, is settled in the finally, even if the worker is cancelled
+            try:
+                deadline = loop.time() + SCAN_BATCH_MAX_DELAY
+                
+                while len(batch) < batch_size:
+                    if not self._scan_queue.empty():
+                        batch.append(self._scan_queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._scan_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Grow while a backlog builds up, shrink back when scans trickle in
+                if self._scan_queue.qsize() > len(batch):
+                    batch_size = min(batch_size * 2, SCAN_BATCH_MAX)
+                elif len(batch) < batch_size:
+                    batch_size = max(batch_size // 2, 1)
+                
+                await self._process_scan_batch(batch)
+            except Exception as e:
+                # Keep the worker alive; the batch's unresolved scans are cancelled below
+                logger.error("Error processing scan batch: %s", e)
+            finally:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.cancel()
+                    self._scan_queue.task_done()
+    
+    async def _process_scan_batch(self, batch):
+        """Process a batch of queued scans, resolving each scan's future"""
+        # Warm the component cache with one lookup for every barcode in the batch
+        component_manager = getattr(self.sync_service, 'component_manager', None)
+        if component_manager and len(batch) > 1:
+            barcodes = [request.event.scan_data for request in batch
+                        if request.event.scan_type == 'barcode']
+            if barcodes:
+                await component_manager.get_components_by_barcodes(barcodes)
+        
+        for request in batch:
+            try:
+                result = await self._process_scan(request.event)
+            except Exception as e:
+                logger.error("Error handling scan event: %s", e)
+                result = (False, str(e))
+            
+            if not request.future.done():
+                request.future.set_result(result)
+    
+    async def _process_scan(self, event) -> Tuple[bool, str]:
+        """Validate and consume the component for a single scan"""
+        if not self.sync_service:
+            return False, "Sync service not available"
+        
+        logger.info("Processing scan event: %s", event.scan_data)
+        
+        # Odoo outages are reported on the scan, not raised: a FAILED event
+        # would be replayed by retry_failed_events and repeat side effects
         try:
-            logger.info(f"Processing scan event: {event.scan_data}")
-            
             # Validate component
-            if self.sync_service:
-                is_valid, message, component = await self.sync_service.validate_component(
-                    event.scan_data, event.scan_type
-                )
-                
-                if is_valid:
-                    # Check if component is valid for current work order
-                    if event.work_order_id:
-                        work_order_valid, work_order_message = await self.sync_service.validate_component_for_work_order(
-                            event.work_order_id, event.scan_data
-                        )
-                        
-                        if work_order_valid:
-                            # Consume component
-                            success, consume_message = await self.sync_service.consume_component(
-                                event.work_order_id, event.scan_data, 1.0
-                            )
-                            
-                            if success:
-                                logger.info(f"Component consumed successfully: {consume_message}")
-                            else:
-                                logger.warning(f"Failed to consume component: {consume_message}")
-                        else:
-                            logger.warning(f"Component not valid for work order: {work_order_message}")
-                    else:
-                        logger.warning("No work order context set")
-                else:
-                    logger.warning(f"Invalid component: {message}")
-            
-        except Exception as e:
-            logger.error(f"Error handling scan event: {e}")
+            is_valid, message, component = await self.sync_service.validate_component(
+                event.scan_data, event.scan_type
+            )
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Odoo error validating component %s: %s", event.scan_data, e)
+            return False, f"Odoo error validating component: {e}"
+        
+        if not is_valid:
+            logger.warning("Invalid component: %s", message)
+            return False, message
+        
+        # Check if component is valid for current work order
+        if not event.work_order_id:
+            logger.warning("No work order context set")
+            return False, "No work order context set"
+        
+        try:
+            work_order_valid, work_order_message = await self.sync_service.validate_component_for_work_order(
+                event.work_order_id, event.scan_data
+            )
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Odoo error validating component for work order %s: %s", event.work_order_id, e)
+            return False, f"Odoo error validating component for work order: {e}"
+        
+        if not work_order_valid:
+            logger.warning("Component not valid for work order: %s", work_order_message)
+            return False, work_order_message
+        
+        # Consume component
+        try:
+            success, consume_message = await self.sync_service.consume_component(
+                event.work_order_id, event.scan_data, 1.0
+            )
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Odoo error consuming component %s: %s", event.scan_data, e)
+            return False, f"Odoo error consuming component: {e}"
+        
+        if success:
+            logger.info("Component consumed successfully: %s", consume_message)
+        else:
+            logger.warning("Failed to consume component: %s", consume_message)
+        
+        return success, consume_message
     
     async def _handle_work_order_event(self, event):
         """Handle work order events"""
-        try:
-            logger.info(f"Processing work order event: {event.work_order_id}")
-            
-            if self.sync_service:
+        logger.info("Processing work order event: %s", event.work_order_id)
+        
+        if self.sync_service:
+            try:
                 success, message = await self.sync_service.set_work_order_context(
                     event.work_order_id, event.operator_id or "unknown"
                 )
-                
-                if success:
-                    logger.info(f"Work order context set: {message}")
-                else:
-                    logger.warning(f"Failed to set work order context: {message}")
-            
-        except Exception as e:
-            logger.error(f"Error handling work order event: {e}")
+            except ODOO_RPC_ERRORS as e:
+                logger.error("Odoo error setting work order context %s: %s", event.work_order_id, e)
+                return
+            
+            if success:
+                logger.info("Work order context set: %s", message)
+            else:
+                logger.warning("Failed to set work order context: %s", message)
     
     async def _handle_component_consumption_event(self, event):
         """Handle component consumption events"""
-        try:
-            logger.info(f"Processing component consumption event: {event.component_id}")
-            
-            # Log traceability
-            if self.sync_service and self.sync_service.traceability_manager:
+        logger.info("Processing component consumption event: %s", event.component_id)
+        
+        # Log traceability
+        if self.sync_service and self.sync_service.traceability_manager:
+            try:
                 await self.sync_service.traceability_manager.log_component_consumption(
                     work_order_id=event.work_order_id or "unknown",
                     component_id=event.component_id or 0,
@@ -240,26 +390,24 @@ class IoTBoxApplication:
                     operator_id=event.operator_id,
                     operator_name=event.operator_name
                 )
-            
-        except Exception as e:
-            logger.error(f"Error handling component consumption event: {e}")
+            except ODOO_RPC_ERRORS as e:
+                logger.error("Odoo error logging component consumption: %s", e)
     
     async def _handle_error_event(self, event):
         """Handle error events"""
-        try:
-            logger.error(f"Processing error event: {event.error_message}")
-            
-            # Log traceability
-            if self.sync_service and self.sync_service.traceability_manager:
+        logger.error("Processing error event: %s", event.error_message)
+        
+        # Log traceability
+        if self.sync_service and self.sync_service.traceability_manager:
+            try:
                 await self.sync_service.traceability_manager.log_error_event(
                     device_id=event.device_id,
                     error_message=event.error_message or "Unknown error",
                     work_order_id=event.work_order_id,
                     operator_id=event.operator_id
                 )
-            
-        except Exception as e:
-            logger.error(f"Error handling error event: {e}")
+            except ODOO_RPC_ERRORS as e:
+                logger.error("Odoo error logging error event: %s", e)
     
     async def start(self):
         """Start the application"""
@@ -276,18 +424,19 @@ class IoTBoxApplication:
             if self.sync_service:
                 await self.sync_service.start()
             
-            # Start web interface
+            # Start scan batching
+            self._scan_worker_task = asyncio.create_task(self._scan_worker())
+            
+            # Serve the web interface from this event loop
             if self.web_app:
-                import threading
-                web_thread = threading.Thread(
-                    target=lambda: self.web_app.run(
-                        host=self.config.get('iot_box', {}).get('server', {}).get('host', '0.0.0.0'),
-                        port=self.config.get('iot_box', {}).get('server', {}).get('port', 8080),
-                        debug=False
-                    )
-                )
-                web_thread.daemon = True
-                web_thread.start()
+                self.web_server = EmbeddedWebServer(uvicorn.Config(
+                    self.web_app,
+                    host=self.settings.server_host,
+                    port=self.settings.server_port,
+                    interface='wsgi',
+                    log_config=None
+                ))
+                self._web_task = asyncio.create_task(self.web_server.serve())
             
             logger.info("IoT Box Application started successfully")
             
@@ -295,11 +444,38 @@ class IoTBoxApplication:
             logger.error(f"Error starting application: {e}")
             raise
     
+    def request_stop(self, signum: Optional[int] = None):
+        """Ask the running application to shut down"""
+        if signum is not None:
+            logger.info(f"Received signal {signum}")
+        self._stop_event.set()
+    
     async def stop(self):
         """Stop the application"""
         try:
             logger.info("Stopping IoT Box Application")
             self.running = False
+            self._stop_event.set()
+            
+            # Stop web interface
+            if self.web_server:
+                self.web_server.should_exit = True
+                await self._web_task
+                self.web_server = None
+            
+            # Stop scan batching; scans still queued are reported as not processed
+            if self._scan_worker_task:
+                self._scan_worker_task.cancel()
+                try:
+                    await self._scan_worker_task
+                except asyncio.CancelledError:
+                    pass
+                self._scan_worker_task = None
+                
+                while not self._scan_queue.empty():
+                    request = self._scan_queue.get_nowait()
+                    if not request.future.done():
+                        request.future.set_result((False, "Application stopped"))
             
             # Stop core managers
             if self.device_manager:
@@ -311,6 +487,11 @@ class IoTBoxApplication:
             if self.buffer_manager:
                 await self.buffer_manager.stop()
             
+            # Create queued stock moves before the Odoo connection goes away
+            work_order_manager = getattr(self.sync_service, 'work_order_manager', None)
+            if work_order_manager:
+                await work_order_manager.aclose()
+            
             if self.sync_service:
                 await self.sync_service.stop()
             
@@ -325,9 +506,8 @@ class IoTBoxApplication:
             await self.initialize()
             await self.start()
             
-            # Keep running until interrupted
-            while self.running:
-                await asyncio.sleep(1)
+            # Keep running until a stop is requested
+            await self._stop_event.wait()
                 
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
@@ -337,17 +517,6 @@ class IoTBoxApplication:
             await self.stop()
 
 
-def setup_signal_handlers(app: IoTBoxApplication):
-    """Setup signal handlers for graceful shutdown"""
-    def signal_handler(signum, frame):
-        logger.info(f"Received signal {signum}")
-        asyncio.create_task(app.stop())
-        sys.exit(0)
-    
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
-
 async def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="IoT Box Odoo Integration")
@@ -359,8 +528,14 @@ async def main():
     # Create application
     app = IoTBoxApplication(args.config)
     
-    # Setup signal handlers
-    setup_signal_handlers(app)
+    # Route SIGINT/SIGTERM into an orderly shutdown of app.run()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, app.request_stop, sig)
+        except NotImplementedError:
+            # Not supported by Windows event loops; Ctrl+C still raises KeyboardInterrupt
+            pass
     
     # Run application
     await app.run()
@@ -7,15 +7,24 @@ Handles component tracking, validation, and inventory management.
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from enum import Enum
 import time
+import xmlrpc.client
 
+try:
+    from odoorpc.error import RPCError as _OdooRPCError
+except ImportError:  # pragma: no cover - optional dependency
+    _OdooRPCError = None
+
+from ...iot_box.utils.helpers import TTLCache, safe_json_dumps_bytes
 from ...iot_box.utils.logger import get_logger
-from ...iot_box.utils.validators import validate_barcode, validate_rfid
+from ...iot_box.utils.validators import classify_scan, validate_barcode, validate_rfid
 
 logger = get_logger(__name__)
 
+_now = time.monotonic
+
 
 class ComponentType(Enum):
     """Component type enumeration"""
@@ -26,7 +35,32 @@ class ComponentType(Enum):
     CONSUMABLE = "consumable"
 
 
-@dataclass
+# Failures of an Odoo RPC round trip (server faults, HTTP errors, network errors).
+# Anything else raised while handling Odoo data is a bug and is left to propagate.
+# odoorpc reports server-side faults as its own RPCError.
+ODOO_RPC_ERRORS = (xmlrpc.client.Error, OSError)
+if _OdooRPCError is not None:
+    ODOO_RPC_ERRORS += (_OdooRPCError,)
+# The subset where the request may never have reached Odoo, so retrying it is safe
+ODOO_TRANSPORT_ERRORS = (xmlrpc.client.ProtocolError, OSError)
+
+_COMPONENT_TYPE_BY_VALUE = {t.value: t for t in ComponentType}
+_COMPONENT_TYPE_VALUES = tuple(_COMPONENT_TYPE_BY_VALUE)
+_REQUIRED_COMPONENT_FIELDS = frozenset({'name', 'default_code', 'barcode', 'type'})
+_PRODUCT_FIELDS = [
+    'name', 'default_code', 'barcode', 'type', 'categ_id',
+    'tracking', 'uom_id', 'standard_price', 'weight', 'volume', 'active'
+]
+
+# scan type -> (format validator, product.product field holding the identifier, log label)
+# RFID is assumed to be stored in the custom x_rfid_tag field
+_SCAN_DISPATCH = {
+    'barcode': (validate_barcode, 'barcode', 'barcode'),
+    'rfid': (validate_rfid, 'x_rfid_tag', 'RFID'),
+}
+
+
+@dataclass(slots=True)
 class Component:
     """Component data structure"""
     id: int
@@ -43,8 +77,37 @@ class Component:
     weight: float
     volume: float
     active: bool = True
-    last_scan: Optional[float] = None
+    last_scan: Optional[float] = None  # monotonic, for interval arithmetic
+    last_scan_wall: Optional[float] = None  # Unix time, for display and Odoo
     scan_count: int = 0
+    # Serialized form, tagged with the scan_count it was built at
+    _json_cache: Optional[Tuple[int, bytes]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the component as a JSON-ready dict"""
+        data = {name: getattr(self, name) for name in _COMPONENT_FIELD_NAMES}
+        data['type'] = self.type.value
+        return data
+    
+    def to_json_bytes(self) -> bytes:
+        """Return the component serialized as JSON bytes.
+        
+        The bytes are cached until the next scan updates the scan statistics.
+        """
+        cached = self._json_cache
+        if cached is not None and cached[0] == self.scan_count:
+            return cached[1]
+        
+        data = safe_json_dumps_bytes(self.to_dict())
+        self._json_cache = (self.scan_count, data)
+        return data
+
+
+# last_scan is a monotonic reading, meaningless outside this process
+_COMPONENT_FIELD_NAMES = tuple(
+    f.name for f in fields(Component)
+    if not f.name.startswith('_') and f.name != 'last_scan'
+)
 
 
 class ComponentManager:
@@ -52,347 +115,326 @@ class ComponentManager:
     
     def __init__(self, odoo_client):
         self.odoo_client = odoo_client
-        self.component_cache: Dict[str, Component] = {}
         self.cache_ttl = 600  # 10 minutes
-        self.cache_timestamps: Dict[str, float] = {}
+        # Both caches are keyed by (scan_type, identifier), since a barcode and
+        # an RFID tag can share the same text
+        self.component_cache = TTLCache(self.cache_ttl, maxsize=10000)
+        # Identifiers Odoo reported as unknown, so repeated bad scans skip the RPC
+        self.negative_cache_ttl = 60
+        self._negative_cache = TTLCache(self.negative_cache_ttl, maxsize=10000)
+        # Lookups in progress, so concurrent scans of one identifier share a fetch
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
     
-    async def get_component_by_barcode(self, barcode: str) -> Optional[Component]:
-        """Get component by barcode"""
+    async def _execute_kw(self, *args):
+        """Run a blocking odoo_client.execute_kw call in a worker thread"""
+        return await asyncio.to_thread(self.odoo_client.execute_kw, *args)
+    
+    def _build_component(self, product_data: Dict[str, Any], cache_key: Optional[Tuple[str, str]] = None) -> Component:
+        """Build a Component from a product.product search_read row.
+        
+        Many2one fields come back as [id, display_name], so category and
+        UOM names are taken from the row itself. The component is cached
+        under cache_key when one is given.
+        """
+        component = Component(
+            id=product_data['id'],
+            name=product_data['name'],
+            default_code=product_data['default_code'],
+            barcode=product_data['barcode'],
+            type=_COMPONENT_TYPE_BY_VALUE[product_data['type']],
+            category_id=product_data['categ_id'][0],
+            category_name=product_data['categ_id'][1],
+            tracking=product_data['tracking'],
+            uom_id=product_data['uom_id'][0],
+            uom_name=product_data['uom_id'][1],
+            cost=product_data['standard_price'],
+            weight=product_data['weight'],
+            volume=product_data['volume'],
+            active=product_data['active']
+        )
+        
+        if cache_key is not None:
+            self.component_cache.set(cache_key, component)
+        
+        return component
+    
+    async def _lookup_component(self, scan_type: str, identifier: str) -> Optional[Component]:
+        """Look up a component by an identifier whose format is already validated"""
+        label = _SCAN_DISPATCH[scan_type][2]
+        cache_key = (scan_type, identifier)
+        
+        # Check caches first
+        if self._negative_cache.get(cache_key):
+            logger.debug("Component not found for %s (cached): %s", label, identifier)
+            return None
+        
+        component = self.component_cache.get(cache_key)
+        if component is not None:
+            return component
+        
+        # Join a fetch already in progress for this identifier
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
         try:
-            # Validate barcode format
-            if not validate_barcode(barcode):
-                logger.warning(f"Invalid barcode format: {barcode}")
-                return None
-            
-            # Check cache first
-            if barcode in self.component_cache:
-                cache_time = self.cache_timestamps.get(barcode, 0)
-                if time.time() - cache_time < self.cache_ttl:
-                    return self.component_cache[barcode]
-            
-            # Search in Odoo
-            products = self.odoo_client.execute_kw(
+            component = await self._fetch_component(scan_type, identifier)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            # Waiters see the same error rather than a CancelledError
+            future.set_exception(e)
+            # Mark it retrieved so a future nobody joined does not warn
+            future.exception()
+            raise
+        else:
+            future.set_result(component)
+            return component
+        finally:
+            del self._inflight[cache_key]
+    
+    async def _fetch_component(self, scan_type: str, identifier: str) -> Optional[Component]:
+        """Fetch a component from Odoo and update the caches"""
+        _, field, label = _SCAN_DISPATCH[scan_type]
+        try:
+            # Search in Odoo (many2one fields carry the category/UOM names)
+            products = await self._execute_kw(
                 'product.product',
                 'search_read',
-                [[('barcode', '=', barcode)]],
-                {'fields': [
-                    'name', 'default_code', 'barcode', 'type', 'categ_id',
-                    'tracking', 'uom_id', 'standard_price', 'weight', 'volume', 'active'
-                ]}
+                [[(field, '=', identifier)]],
+                {'fields': _PRODUCT_FIELDS}
             )
-            
-            if not products:
-                logger.warning(f"Component not found for barcode: {barcode}")
-                return None
-            
-            product_data = products[0]
-            
-            # Get category information
-            category = self.odoo_client.execute_kw(
-                'product.category',
-                'read',
-                [product_data['categ_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Get UOM information
-            uom = self.odoo_client.execute_kw(
-                'uom.uom',
-                'read',
-                [product_data['uom_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Create component object
-            component = Component(
-                id=product_data['id'],
-                name=product_data['name'],
-                default_code=product_data['default_code'],
-                barcode=product_data['barcode'],
-                type=ComponentType(product_data['type']),
-                category_id=product_data['categ_id'][0],
-                category_name=category['name'],
-                tracking=product_data['tracking'],
-                uom_id=product_data['uom_id'][0],
-                uom_name=uom['name'],
-                cost=product_data['standard_price'],
-                weight=product_data['weight'],
-                volume=product_data['volume'],
-                active=product_data['active']
-            )
-            
-            # Cache the component
-            self.component_cache[barcode] = component
-            self.cache_timestamps[barcode] = time.time()
-            
-            logger.debug(f"Retrieved component: {component.name} ({barcode})")
-            return component
-            
-        except Exception as e:
-            logger.error(f"Error getting component by barcode {barcode}: {e}")
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error getting component by %s %s: %s", label, identifier, e)
+            return None
+        
+        if not products:
+            logger.warning("Component not found for %s: %s", label, identifier)
+            self._negative_cache.set((scan_type, identifier), True)
             return None
+        
+        component = self._build_component(products[0], cache_key=(scan_type, identifier))
+        
+        logger.debug("Retrieved component by %s: %s (%s)", label, component.name, identifier)
+        return component
+    
+    async def get_component_by_barcode(self, barcode: str) -> Optional[Component]:
+        """Get component by barcode"""
+        if not validate_barcode(barcode):
+            logger.warning("Invalid barcode format: %s", barcode)
+            return None
+        
+        return await self._lookup_component('barcode', barcode)
     
     async def get_component_by_rfid(self, rfid: str) -> Optional[Component]:
         """Get component by RFID tag"""
+        if not validate_rfid(rfid):
+            logger.warning("Invalid RFID format: %s", rfid)
+            return None
+        
+        return await self._lookup_component('rfid', rfid)
+    
+    async def get_components_by_barcodes(self, barcodes: List[str]) -> Dict[str, Component]:
+        """Get components for several barcodes with a single search_read.
+        
+        Cached and known-missing barcodes are served locally; the rest are
+        fetched together, cached, and unknown ones are negatively cached.
+        """
+        components = {}
+        missing = []
+        for barcode in dict.fromkeys(barcodes):
+            if not validate_barcode(barcode) or self._negative_cache.get(('barcode', barcode)):
+                continue
+            component = self.component_cache.get(('barcode', barcode))
+            if component is not None:
+                components[barcode] = component
+            else:
+                missing.append(barcode)
+        
+        if not missing:
+            return components
+        
         try:
-            # Validate RFID format
-            if not validate_rfid(rfid):
-                logger.warning(f"Invalid RFID format: {rfid}")
-                return None
-            
-            # Search for RFID in product attributes or custom fields
-            # This assumes RFID is stored in a custom field or attribute
-            products = self.odoo_client.execute_kw(
+            products = await self._execute_kw(
                 'product.product',
                 'search_read',
-                [[('x_rfid_tag', '=', rfid)]],  # Custom field for RFID
-                {'fields': [
-                    'name', 'default_code', 'barcode', 'type', 'categ_id',
-                    'tracking', 'uom_id', 'standard_price', 'weight', 'volume', 'active'
-                ]}
-            )
-            
-            if not products:
-                logger.warning(f"Component not found for RFID: {rfid}")
-                return None
-            
-            product_data = products[0]
-            
-            # Get category information
-            category = self.odoo_client.execute_kw(
-                'product.category',
-                'read',
-                [product_data['categ_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Get UOM information
-            uom = self.odoo_client.execute_kw(
-                'uom.uom',
-                'read',
-                [product_data['uom_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Create component object
-            component = Component(
-                id=product_data['id'],
-                name=product_data['name'],
-                default_code=product_data['default_code'],
-                barcode=product_data['barcode'],
-                type=ComponentType(product_data['type']),
-                category_id=product_data['categ_id'][0],
-                category_name=category['name'],
-                tracking=product_data['tracking'],
-                uom_id=product_data['uom_id'][0],
-                uom_name=uom['name'],
-                cost=product_data['standard_price'],
-                weight=product_data['weight'],
-                volume=product_data['volume'],
-                active=product_data['active']
+                [[('barcode', 'in', missing)]],
+                {'fields': _PRODUCT_FIELDS}
             )
-            
-            # Cache the component
-            self.component_cache[rfid] = component
-            self.cache_timestamps[rfid] = time.time()
-            
-            logger.debug(f"Retrieved component by RFID: {component.name} ({rfid})")
-            return component
-            
-        except Exception as e:
-            logger.error(f"Error getting component by RFID {rfid}: {e}")
-            return None
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error getting components for %s barcodes: %s", len(missing), e)
+            return components
+        
+        for product_data in products:
+            barcode = product_data['barcode']
+            components[barcode] = self._build_component(product_data, cache_key=('barcode', barcode))
+        
+        for barcode in missing:
+            if barcode not in components:
+                self._negative_cache.set(('barcode', barcode), True)
+        
+        logger.debug("Retrieved %s of %s components by barcode", len(products), len(missing))
+        return components
     
-    async def validate_component(self, scan_data: str, scan_type: str) -> Tuple[bool, str, Optional[Component]]:
-        """Validate component based on scan data and type"""
-        try:
-            if scan_type.lower() == 'barcode':
-                component = await self.get_component_by_barcode(scan_data)
-            elif scan_type.lower() == 'rfid':
-                component = await self.get_component_by_rfid(scan_data)
-            else:
-                return False, f"Unsupported scan type: {scan_type}", None
-            
-            if not component:
-                return False, f"Component not found for {scan_type}: {scan_data}", None
-            
-            if not component.active:
-                return False, f"Component {component.name} is inactive", None
-            
-            # Update scan statistics
-            component.last_scan = time.time()
-            component.scan_count += 1
-            
-            return True, f"Component {component.name} validated successfully", component
-            
-        except Exception as e:
-            logger.error(f"Error validating component: {e}")
-            return False, f"Error validating component: {str(e)}", None
+    async def validate_component(self, scan_data: str, scan_type: Optional[str] = None) -> Tuple[bool, str, Optional[Component]]:
+        """Validate component based on scan data and type.
+        
+        When no scan type is given it is inferred from the label format.
+        """
+        if not scan_type:
+            scan_type = classify_scan(scan_data)
+            if scan_type is None:
+                return False, f"Unrecognized scan format: {scan_data}", None
+        
+        scan_key = scan_type.lower()
+        dispatch = _SCAN_DISPATCH.get(scan_key)
+        if dispatch is None:
+            return False, f"Unsupported scan type: {scan_type}", None
+        
+        # Reject malformed scans before any cache or RPC work
+        validator = dispatch[0]
+        if not validator(scan_data):
+            return False, f"Invalid {scan_type} format: {scan_data}", None
+        
+        component = await self._lookup_component(scan_key, scan_data)
+        
+        if not component:
+            return False, f"Component not found for {scan_type}: {scan_data}", None
+        
+        if not component.active:
+            return False, f"Component {component.name} is inactive", None
+        
+        # Update scan statistics
+        component.last_scan = _now()
+        component.last_scan_wall = time.time()
+        component.scan_count += 1
+        
+        return True, f"Component {component.name} validated successfully", component
     
     async def get_component_inventory(self, component_id: int) -> Dict[str, Any]:
         """Get component inventory information"""
         try:
-            # Get stock quant information
-            quants = self.odoo_client.execute_kw(
+            # Sum quant quantities per location server-side
+            groups = await self._execute_kw(
                 'stock.quant',
-                'search_read',
-                [[('product_id', '=', component_id)]],
-                {'fields': ['quantity', 'location_id', 'lot_id', 'package_id']}
+                'read_group',
+                [[('product_id', '=', component_id)], ['quantity:sum'], ['location_id']],
+                {'lazy': False}
             )
             
-            total_quantity = sum(quant['quantity'] for quant in quants)
-            
-            # Get location information
-            locations = {}
-            for quant in quants:
-                location_id = quant['location_id'][0]
-                if location_id not in locations:
-                    location = self.odoo_client.execute_kw(
-                        'stock.location',
-                        'read',
-                        [location_id],
-                        {'fields': ['name', 'usage']}
-                    )[0]
-                    locations[location_id] = {
-                        'name': location['name'],
-                        'usage': location['usage'],
-                        'quantity': 0
-                    }
-                locations[location_id]['quantity'] += quant['quantity']
-            
-            return {
-                'component_id': component_id,
-                'total_quantity': total_quantity,
-                'locations': list(locations.values()),
-                'quants_count': len(quants)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting component inventory: {e}")
+            # Get location information in a single read
+            location_rows = []
+            if groups:
+                location_rows = await self._execute_kw(
+                    'stock.location',
+                    'read',
+                    [[group['location_id'][0] for group in groups]],
+                    {'fields': ['name', 'usage']}
+                )
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error getting component inventory: %s", e)
             return {
                 'component_id': component_id,
                 'total_quantity': 0,
                 'locations': [],
                 'quants_count': 0
             }
+        
+        location_by_id = {row['id']: row for row in location_rows}
+        locations = []
+        for group in groups:
+            location = location_by_id[group['location_id'][0]]
+            locations.append({
+                'name': location['name'],
+                'usage': location['usage'],
+                'quantity': group['quantity']
+            })
+        
+        return {
+            'component_id': component_id,
+            'total_quantity': sum(group['quantity'] for group in groups),
+            'locations': locations,
+            'quants_count': sum(group['__count'] for group in groups)
+        }
     
     async def update_component_tracking(self, component_id: int, tracking_type: str) -> Tuple[bool, str]:
         """Update component tracking type"""
         try:
             # Update product tracking
-            self.odoo_client.execute_kw(
+            await self._execute_kw(
                 'product.product',
                 'write',
                 [component_id],
                 {'tracking': tracking_type}
             )
-            
-            logger.info(f"Updated component {component_id} tracking to {tracking_type}")
-            return True, f"Component tracking updated to {tracking_type}"
-            
-        except Exception as e:
-            logger.error(f"Error updating component tracking: {e}")
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error updating component tracking: %s", e)
             return False, f"Error updating component tracking: {str(e)}"
+        
+        logger.info("Updated component %s tracking to %s", component_id, tracking_type)
+        return True, f"Component tracking updated to {tracking_type}"
     
     async def create_component(self, component_data: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
         """Create a new component"""
+        # Validate required fields
+        missing_fields = _REQUIRED_COMPONENT_FIELDS - component_data.keys()
+        
+        if missing_fields:
+            return False, f"Missing required fields: {sorted(missing_fields)}", None
+        
         try:
-            # Validate required fields
-            required_fields = ['name', 'default_code', 'barcode', 'type']
-            missing_fields = [field for field in required_fields if field not in component_data]
-            
-            if missing_fields:
-                return False, f"Missing required fields: {missing_fields}", None
-            
             # Create product
-            product_id = self.odoo_client.execute_kw(
+            product_id = await self._execute_kw(
                 'product.product',
                 'create',
                 [component_data]
             )
-            
-            logger.info(f"Created component: {component_data['name']} (ID: {product_id})")
-            return True, f"Component created successfully", product_id
-            
-        except Exception as e:
-            logger.error(f"Error creating component: {e}")
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error creating component: %s", e)
             return False, f"Error creating component: {str(e)}", None
+        
+        # The barcode or tag may have been scanned before the product existed
+        self._negative_cache.pop(('barcode', component_data['barcode']))
+        if component_data.get('x_rfid_tag'):
+            self._negative_cache.pop(('rfid', component_data['x_rfid_tag']))
+        
+        logger.info("Created component: %s (ID: %s)", component_data['name'], product_id)
+        return True, f"Component created successfully", product_id
     
     async def search_components(self, search_term: str, limit: int = 50) -> List[Component]:
         """Search components by name or code"""
         try:
             # Search products
-            products = self.odoo_client.execute_kw(
+            products = await self._execute_kw(
                 'product.product',
                 'search_read',
                 [[('name', 'ilike', search_term)]],
-                {'fields': [
-                    'name', 'default_code', 'barcode', 'type', 'categ_id',
-                    'tracking', 'uom_id', 'standard_price', 'weight', 'volume', 'active'
-                ], 'limit': limit}
+                {'fields': _PRODUCT_FIELDS, 'limit': limit}
             )
-            
-            components = []
-            for product_data in products:
-                # Get category information
-                category = self.odoo_client.execute_kw(
-                    'product.category',
-                    'read',
-                    [product_data['categ_id'][0]],
-                    {'fields': ['name']}
-                )[0]
-                
-                # Get UOM information
-                uom = self.odoo_client.execute_kw(
-                    'uom.uom',
-                    'read',
-                    [product_data['uom_id'][0]],
-                    {'fields': ['name']}
-                )[0]
-                
-                component = Component(
-                    id=product_data['id'],
-                    name=product_data['name'],
-                    default_code=product_data['default_code'],
-                    barcode=product_data['barcode'],
-                    type=ComponentType(product_data['type']),
-                    category_id=product_data['categ_id'][0],
-                    category_name=category['name'],
-                    tracking=product_data['tracking'],
-                    uom_id=product_data['uom_id'][0],
-                    uom_name=uom['name'],
-                    cost=product_data['standard_price'],
-                    weight=product_data['weight'],
-                    volume=product_data['volume'],
-                    active=product_data['active']
-                )
-                
-                components.append(component)
-            
-            return components
-            
-        except Exception as e:
-            logger.error(f"Error searching components: {e}")
+        except ODOO_RPC_ERRORS as e:
+            logger.error("Error searching components: %s", e)
             return []
+        
+        return [self._build_component(product_data) for product_data in products]
     
     def get_component_statistics(self) -> Dict[str, Any]:
         """Get component statistics"""
         return {
             'cached_components': len(self.component_cache),
-            'cache_ttl': self.cache_ttl,
-            'component_types': [t.value for t in ComponentType]
+            'cached_missing': len(self._negative_cache),
+            'cache_ttl': self.component_cache.ttl,
+            'component_types': list(_COMPONENT_TYPE_VALUES)
         }
     
     def clear_component_cache(self):
         """Clear component cache"""
         self.component_cache.clear()
-        self.cache_timestamps.clear()
+        self._negative_cache.clear()
         logger.info("Component cache cleared")
     
-    def get_cached_component(self, identifier: str) -> Optional[Component]:
+    def get_cached_component(self, identifier: str, scan_type: str = 'barcode') -> Optional[Component]:
         """Get component from cache"""
-        if identifier in self.component_cache:
-            cache_time = self.cache_timestamps.get(identifier, 0)
-            if time.time() - cache_time < self.cache_ttl:
-                return self.component_cache[identifier]
-        return None
+        return self.component_cache.get((scan_type.lower(), identifier))
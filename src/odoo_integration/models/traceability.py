@@ -4,19 +4,106 @@ Traceability Management for Odoo Integration
 Handles audit trails, scan logging, and compliance tracking.
 """
 
+import array
 import asyncio
+import bisect
+import contextvars
+import functools
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+import sys
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Mapping, Optional, Any, Tuple
+from dataclasses import dataclass
 from enum import Enum
+from types import MappingProxyType
 import time
-import json
 
-from ...iot_box.utils.logger import get_logger
-from ...iot_box.utils.helpers import generate_id, get_current_timestamp
+from ...iot_box.utils.logger import AuditWriter, get_logger
+from ...iot_box.utils.helpers import format_timestamp, generate_id, get_current_timestamp, safe_json_dumps
 
 logger = get_logger(__name__)
 
+# mail.message body for the fallback when the iot.traceability model is missing
+_MESSAGE_BODY_TEMPLATE = (
+    "<p><strong>Device:</strong> {device_id}</p>\n"
+    "<p><strong>Scan Data:</strong> {scan_data}</p>\n"
+    "<p><strong>Scan Type:</strong> {scan_type}</p>\n"
+    "<p><strong>Work Order:</strong> {work_order_id}</p>\n"
+    "<p><strong>Component:</strong> {component_name}</p>\n"
+    "<p><strong>Operator:</strong> {operator_name}</p>\n"
+    "<p><strong>Status:</strong> {status}</p>\n"
+    "<p><strong>Timestamp:</strong> {timestamp}</p>\n"
+    "{error}"
+)
+_MESSAGE_ERROR_TEMPLATE = "<p><strong>Error:</strong> {}</p>\n"
+_render_message_body = _MESSAGE_BODY_TEMPLATE.format
+
+# Shared read-only metadata for records logged without any
+_EMPTY_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+# How many appends pass between re-measuring the approximate record size
+_SIZE_SAMPLE_INTERVAL = 256
+
+# Queued to tell the sync worker to flush and exit
+_CLOSE = object()
+
+# Operator (id, name) and device of the current session, used when a log call omits them
+_OPERATOR: contextvars.ContextVar = contextvars.ContextVar('traceability_operator', default=(None, None))
+_DEVICE: contextvars.ContextVar = contextvars.ContextVar('traceability_device', default=None)
+
+
+def set_trace_context(operator_id: Optional[str] = None,
+                      operator_name: Optional[str] = None,
+                      device_id: Optional[str] = None):
+    """Set the operator and device that log calls in the current context default to"""
+    _OPERATOR.set((operator_id, operator_name))
+    _DEVICE.set(device_id)
+
+
+def _resolve_operator(operator_id: Optional[str], operator_name: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return the given operator, or the trace context operator when none was given"""
+    if operator_id is None and operator_name is None:
+        return _OPERATOR.get()
+    return operator_id, operator_name
+
+
+def _record_size(record: "TraceabilityRecord") -> int:
+    """Approximate bytes held by a record: the instance, its own strings and its metadata"""
+    metadata = record.metadata
+    return (sys.getsizeof(record) + sys.getsizeof(record.id) + sys.getsizeof(record.scan_data) +
+            sys.getsizeof(metadata) + sum(sys.getsizeof(v) for v in metadata.values()))
+
+
+def _deque_slice(items: deque, lo: int, hi: int) -> Iterable:
+    """Iterate items[lo:hi] of a deque, walking in from whichever end is nearer"""
+    size = len(items)
+    if lo <= size - hi:
+        return itertools.islice(items, lo, hi)
+    return itertools.islice(reversed(items), size - hi, size - lo)
+
+
+def _is_missing_model_error(error: Exception, model: str) -> bool:
+    """Whether an Odoo RPC error says the model is not installed.
+    
+    Odoo answers with a KeyError on the model name (older releases:
+    "Object <model> doesn't exist"), carried in an XML-RPC Fault's
+    faultString or an odoorpc RPCError's info.
+    """
+    details = ' '.join(str(part) for part in (error, getattr(error, 'faultString', ''), getattr(error, 'info', '')))
+    return (f"KeyError: '{model}'" in details
+            or f"Object {model} doesn't exist" in details
+            or f"Model '{model}' does not exist" in details)
+
+
+def _bump(counter: Counter, key: Any, delta: int):
+    """Adjust a count, dropping the key when it reaches zero"""
+    counter[key] += delta
+    if not counter[key]:
+        del counter[key]
+
 
 class TraceabilityEventType(Enum):
     """Traceability event type enumeration"""
@@ -37,7 +124,15 @@ class TraceabilityStatus(Enum):
     INFO = "info"
 
 
-@dataclass
+# Enum values looked up once, for log lines on the logging hot path
+_EVENT_TYPE_VALUES = {event_type: event_type.value for event_type in TraceabilityEventType}
+_STATUS_VALUES = {status: status.value for status in TraceabilityStatus}
+_SCAN_EVENT = TraceabilityEventType.SCAN.value
+_COMPONENT_CONSUMED_EVENT = TraceabilityEventType.COMPONENT_CONSUMED.value
+_ERROR_EVENT = TraceabilityEventType.ERROR.value
+
+
+@dataclass(slots=True)
 class TraceabilityRecord:
     """Traceability record data structure"""
     id: str
@@ -53,28 +148,61 @@ class TraceabilityRecord:
     operator_name: Optional[str] = None
     timestamp: float = 0.0
     error_message: Optional[str] = None
-    metadata: Dict[str, Any] = None
+    metadata: Mapping[str, Any] = None
     
     def __post_init__(self):
         if self.timestamp == 0.0:
             self.timestamp = get_current_timestamp()
         if self.metadata is None:
-            self.metadata = {}
+            self.metadata = _EMPTY_METADATA
 
 
 class TraceabilityManager:
     """Manages traceability and audit logging"""
     
-    def __init__(self, odoo_client):
+    def __init__(self, odoo_client, audit_log_path: Optional[str] = None):
         self.odoo_client = odoo_client
-        self.records: List[TraceabilityRecord] = []
+        # TRACEABILITY lines go to a dedicated batched file when a path is given
+        self._file_writer = AuditWriter(audit_log_path) if audit_log_path else None
+        # Blocking XML-RPC calls run here so they never stall the event loop
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="traceability_rpc")
         self.max_memory_records = 1000
+        # Ring buffer: once full, each append drops the oldest record
+        self.records: "deque[TraceabilityRecord]" = deque(maxlen=self.max_memory_records)
+        # Timestamps of self.records in the same order, for bisecting time ranges.
+        # Evicted entries stay before _timestamps_start until compacted in bulk.
+        self._timestamps = array.array('d')
+        self._timestamps_start = 0
+        # Adjacent pairs in self.records whose timestamps go backwards (wall clock steps)
+        self._time_inversions = 0
+        # Sampled size of one record, refreshed every _SIZE_SAMPLE_INTERVAL appends
+        self._approx_record_bytes = 0
+        self._append_count = 0
+        # Records in self.records by lookup key, oldest first, kept in step by _append
+        self._by_work_order: Dict[str, deque] = defaultdict(deque)
+        self._by_component: Dict[int, deque] = defaultdict(deque)
+        self._by_device: Dict[str, deque] = defaultdict(deque)
+        # Running statistics over self.records, kept in step by _append
+        self._type_counts: Counter = Counter()
+        self._status_counts: Counter = Counter()
+        self._wo_status_counts: Dict[str, Counter] = defaultdict(Counter)
+        self._wo_consumption: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
         self.batch_size = 100
         self.sync_interval = 60  # seconds
         self.last_sync = 0.0
+        # Repeats of an unsynced error within this many seconds only bump its repeat_count
+        self.error_coalesce_window = 1.0
+        self._recent_errors: Dict[Tuple[Optional[str], str], Tuple[float, TraceabilityRecord]] = {}
+        # Whether iot.traceability is missing and mail.message is used; None until probed
+        self._use_fallback: Optional[bool] = None
+        
+        # Records waiting for sync, drained in batches by a background task
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        self._pending: List[TraceabilityRecord] = []
+        self._worker: Optional[asyncio.Task] = None
     
     async def log_scan_event(self, 
-                           device_id: str,
+                           device_id: Optional[str],
                            scan_data: str,
                            scan_type: str,
                            work_order_id: Optional[str] = None,
@@ -88,6 +216,8 @@ class TraceabilityManager:
         """Log a scan event"""
         try:
             record_id = generate_id("trace")
+            device_id = device_id or _DEVICE.get()
+            operator_id, operator_name = _resolve_operator(operator_id, operator_name)
             
             record = TraceabilityRecord(
                 id=record_id,
@@ -102,21 +232,15 @@ class TraceabilityManager:
                 operator_id=operator_id,
                 operator_name=operator_name,
                 error_message=error_message,
-                metadata=metadata or {}
+                metadata=metadata or _EMPTY_METADATA
             )
             
-            # Add to memory records
-            self.records.append(record)
-            
-            # Trim memory records if needed
-            if len(self.records) > self.max_memory_records:
-                self.records = self.records[-self.max_memory_records:]
+            # Add to memory records and queue for sync
+            await self._queue_record(record)
             
             # Log to file
-            logger.info(f"TRACEABILITY: {record.event_type.value} | Device: {device_id} | Data: {scan_data} | Status: {status.value}")
-            
-            # Sync to Odoo if needed
-            await self._sync_if_needed()
+            self._audit(logging.INFO, "TRACEABILITY: %s | Device: %s | Data: %s | Status: %s",
+                        _SCAN_EVENT, device_id, scan_data, _STATUS_VALUES[status])
             
             return record_id
             
@@ -135,6 +259,7 @@ class TraceabilityManager:
         """Log component consumption event"""
         try:
             record_id = generate_id("trace")
+            operator_id, operator_name = _resolve_operator(operator_id, operator_name)
             
             record = TraceabilityRecord(
                 id=record_id,
@@ -154,13 +279,11 @@ class TraceabilityManager:
                 }
             )
             
-            self.records.append(record)
+            await self._queue_record(record)
             
             # Log to file
-            logger.info(f"TRACEABILITY: {record.event_type.value} | WorkOrder: {work_order_id} | Component: {component_name} | Quantity: {quantity}")
-            
-            # Sync to Odoo
-            await self._sync_if_needed()
+            self._audit(logging.INFO, "TRACEABILITY: %s | WorkOrder: %s | Component: %s | Quantity: %s",
+                        _COMPONENT_CONSUMED_EVENT, work_order_id, component_name, quantity)
             
             return record_id
             
@@ -177,27 +300,26 @@ class TraceabilityManager:
         """Log work order event"""
         try:
             record_id = generate_id("trace")
+            event_name = _EVENT_TYPE_VALUES[event_type]
+            operator_id, operator_name = _resolve_operator(operator_id, operator_name)
             
             record = TraceabilityRecord(
                 id=record_id,
                 event_type=event_type,
                 status=TraceabilityStatus.SUCCESS,
                 device_id="system",
-                scan_data=f"Work order {event_type.value}: {work_order_id}",
+                scan_data=f"Work order {event_name}: {work_order_id}",
                 scan_type="work_order",
                 work_order_id=work_order_id,
                 operator_id=operator_id,
                 operator_name=operator_name,
-                metadata=metadata or {}
+                metadata=metadata or _EMPTY_METADATA
             )
             
-            self.records.append(record)
+            await self._queue_record(record)
             
             # Log to file
-            logger.info(f"TRACEABILITY: {record.event_type.value} | WorkOrder: {work_order_id}")
-            
-            # Sync to Odoo
-            await self._sync_if_needed()
+            self._audit(logging.INFO, "TRACEABILITY: %s | WorkOrder: %s", event_name, work_order_id)
             
             return record_id
             
@@ -206,14 +328,30 @@ class TraceabilityManager:
             return ""
     
     async def log_error_event(self,
-                            device_id: str,
+                            device_id: Optional[str],
                             error_message: str,
                             work_order_id: Optional[str] = None,
                             operator_id: Optional[str] = None,
                             metadata: Optional[Dict[str, Any]] = None) -> str:
         """Log error event"""
         try:
+            device_id = device_id or _DEVICE.get()
+            
+            # Coalesce a burst of the same error into the record already waiting for sync
+            error_key = (device_id, error_message[:64])
+            now = time.monotonic()
+            recent = self._recent_errors.get(error_key)
+            if recent and now - recent[0] < self.error_coalesce_window:
+                record = recent[1]
+                if 'repeat_count' in record.metadata:
+                    record.metadata['repeat_count'] += 1
+                else:
+                    record.metadata = {**record.metadata, 'repeat_count': 2}
+                self._recent_errors[error_key] = (now, record)
+                return record.id
+            
             record_id = generate_id("trace")
+            operator_id, operator_name = _resolve_operator(operator_id, None)
             
             record = TraceabilityRecord(
                 id=record_id,
@@ -224,17 +362,16 @@ class TraceabilityManager:
                 scan_type="error",
                 work_order_id=work_order_id,
                 operator_id=operator_id,
+                operator_name=operator_name,
                 error_message=error_message,
-                metadata=metadata or {}
+                metadata=metadata or _EMPTY_METADATA
             )
             
-            self.records.append(record)
+            await self._queue_record(record)
+            self._recent_errors[error_key] = (now, record)
             
             # Log to file
-            logger.error(f"TRACEABILITY: {record.event_type.value} | Device: {device_id} | Error: {error_message}")
-            
-            # Sync to Odoo
-            await self._sync_if_needed()
+            self._audit(logging.ERROR, "TRACEABILITY: %s | Device: %s | Error: %s", _ERROR_EVENT, device_id, error_message)
             
             return record_id
             
@@ -242,92 +379,246 @@ class TraceabilityManager:
             logger.error(f"Error logging error event: {e}")
             return ""
     
-    async def _sync_if_needed(self):
-        """Sync records to Odoo if needed"""
-        current_time = get_current_timestamp()
+    async def _call(self, *args, **kwargs):
+        """Run odoo_client.execute_kw in the RPC thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool, functools.partial(self.odoo_client.execute_kw, *args, **kwargs)
+        )
+    
+    def _audit(self, level: int, msg: str, *args):
+        """Write a TRACEABILITY line to the audit file, or to the module logger"""
+        if self._file_writer is None:
+            logger.log(level, msg, *args)
+            return
+        
+        line = "%s - %s - %s\n" % (format_timestamp(time.time()), logging.getLevelName(level), msg % args)
+        self._file_writer.write(line.encode())
+    
+    def _record_indexes(self, record: TraceabilityRecord):
+        """Yield (index, key) for each lookup index the record belongs to"""
+        if record.work_order_id:
+            yield self._by_work_order, record.work_order_id
+        if record.component_id:
+            yield self._by_component, record.component_id
+        if record.device_id:
+            yield self._by_device, record.device_id
+    
+    def _update_counts(self, record: TraceabilityRecord, delta: int):
+        """Add (delta=1) or remove (delta=-1) a record from the running statistics"""
+        _bump(self._type_counts, _EVENT_TYPE_VALUES[record.event_type], delta)
+        _bump(self._status_counts, _STATUS_VALUES[record.status], delta)
+        
+        work_order_id = record.work_order_id
+        if not work_order_id:
+            return
         
-        if (current_time - self.last_sync > self.sync_interval or 
-            len(self.records) >= self.batch_size):
+        status_counts = self._wo_status_counts[work_order_id]
+        _bump(status_counts, record.status, delta)
+        if not status_counts:
+            del self._wo_status_counts[work_order_id]
+        
+        if record.event_type == TraceabilityEventType.COMPONENT_CONSUMED:
+            consumption = self._wo_consumption[work_order_id]
+            component_name = record.component_name or "Unknown"
+            entry = consumption.setdefault(component_name, {'quantity': 0, 'events': 0})
+            entry['quantity'] += delta * record.metadata.get('quantity', 0)
+            entry['events'] += delta
+            if not entry['events']:
+                del consumption[component_name]
+            if not consumption:
+                del self._wo_consumption[work_order_id]
+    
+    def _append(self, record: TraceabilityRecord):
+        """Add a record to the ring buffer, evicting the oldest from the indexes when full"""
+        if len(self.records) == self.records.maxlen:
+            oldest = self.records.popleft()
+            self._timestamps_start += 1
+            start = self._timestamps_start
+            if start < len(self._timestamps) and oldest.timestamp > self._timestamps[start]:
+                self._time_inversions -= 1
+            if start >= self.max_memory_records:
+                del self._timestamps[:start]
+                self._timestamps_start = 0
+            for index, key in self._record_indexes(oldest):
+                entries = index[key]
+                entries.popleft()  # the oldest record is first in each of its indexes
+                if not entries:
+                    del index[key]
+            self._update_counts(oldest, -1)
+        
+        if len(self._timestamps) > self._timestamps_start and record.timestamp < self._timestamps[-1]:
+            self._time_inversions += 1
+        self.records.append(record)
+        self._timestamps.append(record.timestamp)
+        if self._append_count % _SIZE_SAMPLE_INTERVAL == 0:
+            self._approx_record_bytes = _record_size(record)
+        self._append_count += 1
+        for index, key in self._record_indexes(record):
+            index[key].append(record)
+        self._update_counts(record, 1)
+    
+    async def _queue_record(self, record: TraceabilityRecord):
+        """Keep a record in memory and queue it for the sync worker"""
+        self._append(record)
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._sync_worker())
+        
+        # Only waits when the sync worker has fallen behind
+        await self._queue.put(record)
+    
+    async def _sync_worker(self):
+        """Sync queued records once batch_size are pending or sync_interval passes"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            record = await self._queue.get()
+            if record is _CLOSE:
+                break
+            self._pending.append(record)
+            
+            deadline = loop.time() + self.sync_interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _CLOSE:
+                    await self.sync_to_odoo()
+                    return
+                self._pending.append(record)
+            
             await self.sync_to_odoo()
+        
+        await self.sync_to_odoo()
+    
+    async def aclose(self):
+        """Flush queued records to Odoo, stop the sync worker and close the audit file"""
+        if self._worker is None or self._worker.done():
+            await self.sync_to_odoo()
+        else:
+            await self._queue.put(_CLOSE)
+            await self._worker
+            self._worker = None
+        
+        if self._file_writer is not None:
+            await self._file_writer.aclose()
     
     async def sync_to_odoo(self) -> Tuple[bool, str]:
         """Sync traceability records to Odoo"""
         try:
-            if not self.records:
+            # Take every record waiting for sync
+            records_to_sync = self._pending
+            self._pending = []
+            while not self._queue.empty():
+                record = self._queue.get_nowait()
+                if record is _CLOSE:
+                    # Leave the stop request for the worker
+                    self._queue.put_nowait(record)
+                    break
+                records_to_sync.append(record)
+            # Errors logged from here on start a new record rather than updating a synced one
+            self._recent_errors.clear()
+            
+            if not records_to_sync:
                 return True, "No records to sync"
             
-            # Get records to sync
-            records_to_sync = self.records.copy()
-            self.records.clear()
-            
             # Create traceability records in Odoo
-            for record in records_to_sync:
-                await self._create_odoo_traceability_record(record)
+            await self._create_odoo_traceability_records(records_to_sync)
             
             self.last_sync = get_current_timestamp()
             
-            logger.info(f"Synced {len(records_to_sync)} traceability records to Odoo")
+            logger.info("Synced %s traceability records to Odoo", len(records_to_sync))
             return True, f"Synced {len(records_to_sync)} records successfully"
             
         except Exception as e:
             logger.error(f"Error syncing traceability records: {e}")
             return False, f"Error syncing records: {str(e)}"
     
-    async def _create_odoo_traceability_record(self, record: TraceabilityRecord):
-        """Create traceability record in Odoo"""
+    def _record_to_vals(self, record: TraceabilityRecord) -> Dict[str, Any]:
+        """Build iot.traceability create values for a record"""
+        return {
+            'scan_id': record.id,
+            'device_id': record.device_id,
+            'scan_data': record.scan_data,
+            'scan_type': record.scan_type,
+            'work_order_id': record.work_order_id,
+            'component_id': record.component_id,
+            'component_name': record.component_name,
+            'operator_id': record.operator_id,
+            'operator_name': record.operator_name,
+            'timestamp': record.timestamp,
+            'event_type': _EVENT_TYPE_VALUES[record.event_type],
+            'status': _STATUS_VALUES[record.status],
+            'error_message': record.error_message,
+            'metadata': safe_json_dumps(record.metadata) if record.metadata else None
+        }
+    
+    def _record_to_message_vals(self, record: TraceabilityRecord) -> Dict[str, Any]:
+        """Build mail.message create values for a record (fallback logging)"""
+        return {
+            'model': 'mrp.production',
+            'res_id': 0,
+            'message_type': 'notification',
+            'subject': f"IoT Traceability: {_EVENT_TYPE_VALUES[record.event_type]}",
+            'body': _render_message_body(
+                device_id=record.device_id,
+                scan_data=record.scan_data,
+                scan_type=record.scan_type,
+                work_order_id=record.work_order_id or 'N/A',
+                component_name=record.component_name or 'N/A',
+                operator_name=record.operator_name or 'N/A',
+                status=_STATUS_VALUES[record.status],
+                timestamp=record.timestamp,
+                error=_MESSAGE_ERROR_TEMPLATE.format(record.error_message) if record.error_message else ''
+            ),
+            'date': record.timestamp
+        }
+    
+    async def _create_odoo_traceability_records(self, records: List[TraceabilityRecord]):
+        """Create traceability records in Odoo with a single create call"""
+        if not records:
+            return
+        
         try:
-            # Check if traceability model exists
-            try:
-                self.odoo_client.execute_kw(
-                    'iot.traceability',
+            if self._use_fallback is None:
+                # First sync: find out once whether the custom model exists
+                try:
+                    await self._call(
+                        'iot.traceability',
+                        'create',
+                        [[self._record_to_vals(record) for record in records]]
+                    )
+                    self._use_fallback = False
+                    return
+                except Exception as e:
+                    # Only a missing custom model switches to the standard log for good;
+                    # anything else fails this sync and the next one probes again
+                    if not _is_missing_model_error(e, 'iot.traceability'):
+                        raise
+                    logger.warning("Custom traceability model not available, logging to standard log: %s", e)
+                    self._use_fallback = True
+            
+            if self._use_fallback:
+                # Create log entries in the system
+                await self._call(
+                    'mail.message',
                     'create',
-                    [{
-                        'scan_id': record.id,
-                        'device_id': record.device_id,
-                        'scan_data': record.scan_data,
-                        'scan_type': record.scan_type,
-                        'work_order_id': record.work_order_id,
-                        'component_id': record.component_id,
-                        'component_name': record.component_name,
-                        'operator_id': record.operator_id,
-                        'operator_name': record.operator_name,
-                        'timestamp': record.timestamp,
-                        'event_type': record.event_type.value,
-                        'status': record.status.value,
-                        'error_message': record.error_message,
-                        'metadata': json.dumps(record.metadata) if record.metadata else None
-                    }]
+                    [[self._record_to_message_vals(record) for record in records]]
                 )
-            except Exception as e:
-                # If custom model doesn't exist, log to standard log
-                logger.warning(f"Custom traceability model not available, logging to standard log: {e}")
-                
-                # Create a log entry in the system
-                self.odoo_client.execute_kw(
-                    'mail.message',
+            else:
+                await self._call(
+                    'iot.traceability',
                     'create',
-                    [{
-                        'model': 'mrp.production',
-                        'res_id': 0,
-                        'message_type': 'notification',
-                        'subject': f"IoT Traceability: {record.event_type.value}",
-                        'body': f"""
-                        <p><strong>Device:</strong> {record.device_id}</p>
-                        <p><strong>Scan Data:</strong> {record.scan_data}</p>
-                        <p><strong>Scan Type:</strong> {record.scan_type}</p>
-                        <p><strong>Work Order:</strong> {record.work_order_id or 'N/A'}</p>
-                        <p><strong>Component:</strong> {record.component_name or 'N/A'}</p>
-                        <p><strong>Operator:</strong> {record.operator_name or 'N/A'}</p>
-                        <p><strong>Status:</strong> {record.status.value}</p>
-                        <p><strong>Timestamp:</strong> {record.timestamp}</p>
-                        {f'<p><strong>Error:</strong> {record.error_message}</p>' if record.error_message else ''}
-                        """,
-                        'date': record.timestamp
-                    }]
+                    [[self._record_to_vals(record) for record in records]]
                 )
             
         except Exception as e:
-            logger.error(f"Error creating Odoo traceability record: {e}")
+            logger.error(f"Error creating Odoo traceability records: {e}")
             raise
     
     async def get_traceability_records(self,
@@ -340,32 +631,35 @@ class TraceabilityManager:
                                      limit: int = 100) -> List[TraceabilityRecord]:
         """Get traceability records with filters"""
         try:
-            # Filter records
-            filtered_records = self.records.copy()
-            
-            if work_order_id:
-                filtered_records = [r for r in filtered_records if r.work_order_id == work_order_id]
-            
-            if component_id:
-                filtered_records = [r for r in filtered_records if r.component_id == component_id]
-            
-            if device_id:
-                filtered_records = [r for r in filtered_records if r.device_id == device_id]
-            
-            if start_time:
-                filtered_records = [r for r in filtered_records if r.timestamp >= start_time]
-            
-            if end_time:
-                filtered_records = [r for r in filtered_records if r.timestamp <= end_time]
-            
-            if event_type:
-                filtered_records = [r for r in filtered_records if r.event_type == event_type]
-            
-            # Sort by timestamp (newest first)
-            filtered_records.sort(key=lambda x: x.timestamp, reverse=True)
-            
-            # Apply limit
-            return filtered_records[:limit]
+            # All filters checked in a single pass over the records
+            def keep(r: TraceabilityRecord) -> bool:
+                return ((not work_order_id or r.work_order_id == work_order_id) and
+                        (not component_id or r.component_id == component_id) and
+                        (not device_id or r.device_id == device_id) and
+                        (not start_time or r.timestamp >= start_time) and
+                        (not end_time or r.timestamp <= end_time) and
+                        (not event_type or r.event_type == event_type))
+            
+            # Start from the smallest matching index rather than every record
+            candidates = self.records
+            for index, key in ((self._by_work_order, work_order_id),
+                               (self._by_component, component_id),
+                               (self._by_device, device_id)):
+                if key:
+                    entries = index.get(key, ())
+                    if len(entries) < len(candidates):
+                        candidates = entries
+            
+            # Records arrive in time order, so a time range is a contiguous slice
+            if (candidates is self.records and (start_time or end_time)
+                    and not self._time_inversions):
+                timestamps, first = self._timestamps, self._timestamps_start
+                lo = bisect.bisect_left(timestamps, start_time, first) if start_time else first
+                hi = bisect.bisect_right(timestamps, end_time, first) if end_time else len(timestamps)
+                candidates = _deque_slice(self.records, lo - first, hi - first)
+            
+            # Newest first, keeping only the top `limit` instead of sorting everything
+            return heapq.nlargest(limit, filter(keep, candidates), key=lambda r: r.timestamp)
             
         except Exception as e:
             logger.error(f"Error getting traceability records: {e}")
@@ -377,40 +671,27 @@ class TraceabilityManager:
             records = await self.get_traceability_records(work_order_id=work_order_id)
             
             # Group by event type
-            events_by_type = {}
-            for record in records:
-                event_type = record.event_type.value
-                if event_type not in events_by_type:
-                    events_by_type[event_type] = []
-                events_by_type[event_type].append(record)
-            
-            # Calculate statistics
-            total_events = len(records)
-            error_events = len([r for r in records if r.status == TraceabilityStatus.ERROR])
-            success_events = len([r for r in records if r.status == TraceabilityStatus.SUCCESS])
-            
-            # Get component consumption summary
-            component_consumption = {}
+            events_by_type: Dict[str, List[TraceabilityRecord]] = defaultdict(list)
             for record in records:
-                if record.event_type == TraceabilityEventType.COMPONENT_CONSUMED:
-                    component_name = record.component_name or "Unknown"
-                    if component_name not in component_consumption:
-                        component_consumption[component_name] = {
-                            'quantity': 0,
-                            'events': 0
-                        }
-                    component_consumption[component_name]['quantity'] += record.metadata.get('quantity', 0)
-                    component_consumption[component_name]['events'] += 1
+                events_by_type[_EVENT_TYPE_VALUES[record.event_type]].append(record)
+            
+            # Statistics come from the running counts over all in-memory records
+            wo_records = self._by_work_order.get(work_order_id, ())
+            status_counts = self._wo_status_counts.get(work_order_id, {})
+            component_consumption = {
+                component_name: dict(entry)
+                for component_name, entry in self._wo_consumption.get(work_order_id, {}).items()
+            }
             
             return {
                 'work_order_id': work_order_id,
-                'total_events': total_events,
-                'error_events': error_events,
-                'success_events': success_events,
-                'events_by_type': events_by_type,
+                'total_events': len(wo_records),
+                'error_events': status_counts.get(TraceabilityStatus.ERROR, 0),
+                'success_events': status_counts.get(TraceabilityStatus.SUCCESS, 0),
+                'events_by_type': dict(events_by_type),
                 'component_consumption': component_consumption,
-                'first_event': records[-1].timestamp if records else None,
-                'last_event': records[0].timestamp if records else None
+                'first_event': wo_records[0].timestamp if wo_records else None,
+                'last_event': wo_records[-1].timestamp if wo_records else None
             }
             
         except Exception as e:
@@ -438,28 +719,17 @@ class TraceabilityManager:
                 'memory_usage': 0
             }
         
-        # Count by event type
-        records_by_type = {}
-        for record in self.records:
-            event_type = record.event_type.value
-            records_by_type[event_type] = records_by_type.get(event_type, 0) + 1
-        
-        # Count by status
-        records_by_status = {}
-        for record in self.records:
-            status = record.status.value
-            records_by_status[status] = records_by_status.get(status, 0) + 1
-        
         return {
             'total_records': total_records,
-            'records_by_type': records_by_type,
-            'records_by_status': records_by_status,
-            'memory_usage': total_records * 1024,  # Approximate memory usage
+            'records_by_type': dict(self._type_counts),
+            'records_by_status': dict(self._status_counts),
+            'memory_usage': total_records * self._approx_record_bytes,  # Approximate memory usage
             'last_sync': self.last_sync,
+            'pending_sync': len(self._pending) + self._queue.qsize(),
             'sync_interval': self.sync_interval
         }
     
-    def export_traceability_data(self, 
+    async def export_traceability_data(self, 
                                start_time: Optional[float] = None,
                                end_time: Optional[float] = None) -> List[Dict[str, Any]]:
         """Export traceability data for reporting"""
@@ -470,15 +740,26 @@ class TraceabilityManager:
                 limit=10000  # Large limit for export
             )
             
-            # Convert to dictionary format
-            export_data = []
-            for record in records:
-                record_dict = asdict(record)
-                record_dict['event_type'] = record.event_type.value
-                record_dict['status'] = record.status.value
-                export_data.append(record_dict)
-            
-            return export_data
+            # Convert to dictionary format (metadata is copied shallowly, not deep-copied)
+            return [
+                {
+                    'id': record.id,
+                    'event_type': _EVENT_TYPE_VALUES[record.event_type],
+                    'status': _STATUS_VALUES[record.status],
+                    'device_id': record.device_id,
+                    'scan_data': record.scan_data,
+                    'scan_type': record.scan_type,
+                    'work_order_id': record.work_order_id,
+                    'component_id': record.component_id,
+                    'component_name': record.component_name,
+                    'operator_id': record.operator_id,
+                    'operator_name': record.operator_name,
+                    'timestamp': record.timestamp,
+                    'error_message': record.error_message,
+                    'metadata': dict(record.metadata)
+                }
+                for record in records
+            ]
             
         except Exception as e:
             logger.error(f"Error exporting traceability data: {e}")
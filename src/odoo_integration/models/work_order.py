@@ -6,16 +6,29 @@ Handles work order operations including context setting, validation, and status
 
 import asyncio
 import logging
+import sys
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import time
 
+from ...iot_box.utils.helpers import TTLCache
 from ...iot_box.utils.logger import get_logger
 from ...iot_box.utils.validators import validate_work_order
+from .component import ODOO_TRANSPORT_ERRORS
 
 logger = get_logger(__name__)
 
+# Stock moves are created in Odoo once this many are queued, or after the delay
+STOCK_MOVE_BATCH_SIZE = 10
+STOCK_MOVE_FLUSH_DELAY = 2.0  # seconds
+# Failed flushes are retried with the delay doubling up to this cap
+STOCK_MOVE_MAX_RETRY_DELAY = 60.0  # seconds
+
+# Used when the database has no internal / production location to resolve
+DEFAULT_STOCK_LOCATION_ID = 8
+DEFAULT_PRODUCTION_LOCATION_ID = 9
+
 
 class WorkOrderStatus(Enum):
     """Work order status enumeration"""
@@ -27,7 +40,20 @@ class WorkOrderStatus(Enum):
     CANCEL = "cancel"
 
 
-@dataclass
+# Seconds a cached work order stays valid, by how likely its state is to change
+_STATUS_CACHE_TTL = {
+    WorkOrderStatus.PROGRESS: 30,
+    WorkOrderStatus.CONFIRMED: 300,
+    WorkOrderStatus.DONE: 900,
+    WorkOrderStatus.CANCEL: 900,
+}
+_DEFAULT_CACHE_TTL = 60
+
+# States a work order can be produced in
+_ACTIVE_STATUSES = frozenset({WorkOrderStatus.CONFIRMED, WorkOrderStatus.PROGRESS})
+
+
+@dataclass(slots=True)
 class WorkOrder:
     """Work order data structure"""
     id: str
@@ -42,10 +68,23 @@ class WorkOrder:
     user_id: int
     user_name: str
     components: List[Dict[str, Any]] = None
+    components_by_barcode: Dict[str, Dict[str, Any]] = None
+    odoo_db_id: Optional[int] = None
+    # Components with nothing left to consume / with any consumption, kept by consume_component
+    n_fully_consumed: int = 0
+    n_any_consumed: int = 0
     
     def __post_init__(self):
         if self.components is None:
             self.components = []
+        if self.components_by_barcode is None:
+            # First BOM line per barcode, matching the order components are listed in
+            self.components_by_barcode = {}
+            for component in self.components:
+                if component['barcode']:
+                    self.components_by_barcode.setdefault(component['barcode'], component)
+        self.n_fully_consumed = sum(1 for c in self.components if c['remaining_quantity'] <= 0)
+        self.n_any_consumed = sum(1 for c in self.components if c['consumed_quantity'] > 0)
 
 
 class WorkOrderManager:
@@ -54,9 +93,22 @@ class WorkOrderManager:
     def __init__(self, odoo_client):
         self.odoo_client = odoo_client
         self.current_work_order: Optional[WorkOrder] = None
-        self.work_order_cache: Dict[str, WorkOrder] = {}
-        self.cache_ttl = 300  # 5 minutes
-        self.cache_timestamps: Dict[str, float] = {}
+        self.cache_ttl = 300  # 5 minutes, refined per status by _STATUS_CACHE_TTL
+        # Monotonic so clock syncs after boot cannot expire or pin every entry
+        self.work_order_cache = TTLCache(self.cache_ttl, maxsize=256, timer=time.monotonic)
+        # Stock moves waiting for a batched create
+        self._pending_moves: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Held for the whole of a flush, so a flush never overlaps one in flight
+        self._flush_lock = asyncio.Lock()
+        # Source and destination of consumption moves, resolved on first use
+        self.stock_location_id: Optional[int] = None
+        self.production_location_id: Optional[int] = None
+        self._locations_lock = asyncio.Lock()
+    
+    async def _execute_kw(self, *args):
+        """Run a blocking odoo_client.execute_kw call in a worker thread"""
+        return await asyncio.to_thread(self.odoo_client.execute_kw, *args)
     
     async def set_work_order_context(self, work_order_id: str, operator_id: str) -> Tuple[bool, str]:
         """Set current work order context"""
@@ -72,7 +124,7 @@ class WorkOrderManager:
                 return False, f"Work order {work_order_id} not found"
             
             # Check if work order is in valid state
-            if work_order.status not in [WorkOrderStatus.CONFIRMED, WorkOrderStatus.PROGRESS]:
+            if work_order.status not in _ACTIVE_STATUSES:
                 return False, f"Work order {work_order_id} is not in a valid state for production"
             
             # Set current work order
@@ -91,18 +143,17 @@ class WorkOrderManager:
         """Get work order by ID"""
         try:
             # Check cache first
-            if work_order_id in self.work_order_cache:
-                cache_time = self.cache_timestamps.get(work_order_id, 0)
-                if time.time() - cache_time < self.cache_ttl:
-                    return self.work_order_cache[work_order_id]
+            work_order = self.work_order_cache.get(work_order_id)
+            if work_order is not None:
+                return work_order
             
             # Get from Odoo
-            work_orders = self.odoo_client.execute_kw(
+            work_orders = await self._execute_kw(
                 'mrp.production',
                 'search_read',
                 [[('name', '=', work_order_id)]],
                 {'fields': [
-                    'name', 'product_id', 'product_qty', 'state', 'bom_id',
+                    'id', 'name', 'product_id', 'product_qty', 'state', 'bom_id',
                     'date_planned_start', 'date_planned_finished', 'user_id'
                 ]}
             )
@@ -112,24 +163,19 @@ class WorkOrderManager:
             
             wo_data = work_orders[0]
             
-            # Get product information
-            product = self.odoo_client.execute_kw(
-                'product.product',
-                'read',
-                [wo_data['product_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Get user information
-            user = self.odoo_client.execute_kw(
-                'res.users',
-                'read',
-                [wo_data['user_id'][0]],
-                {'fields': ['name']}
-            )[0]
-            
-            # Get BOM components
-            components = await self._get_bom_components(wo_data['bom_id'][0])
+            # Product and BOM components are independent, so fetch them together.
+            # The user name needs no read: a user's display name is its name,
+            # which the user_id many2one pair already carries.
+            products, components = await asyncio.gather(
+                self._execute_kw(
+                    'product.product',
+                    'read',
+                    [wo_data['product_id'][0]],
+                    {'fields': ['name']}
+                ),
+                self._get_bom_components(wo_data['bom_id'][0])
+            )
+            product = products[0]
             
             # Create work order object
             work_order = WorkOrder(
@@ -143,13 +189,15 @@ class WorkOrderManager:
                 date_planned_start=wo_data['date_planned_start'],
                 date_planned_finished=wo_data['date_planned_finished'],
                 user_id=wo_data['user_id'][0],
-                user_name=user['name'],
-                components=components
+                user_name=wo_data['user_id'][1],
+                components=components,
+                odoo_db_id=wo_data['id']
             )
             
-            # Cache the work order
-            self.work_order_cache[work_order_id] = work_order
-            self.cache_timestamps[work_order_id] = time.time()
+            # Cache the work order, reclaiming entries that expired without being looked up again
+            self.work_order_cache.expire()
+            self.work_order_cache.set(work_order_id, work_order,
+                                      ttl=_STATUS_CACHE_TTL.get(work_order.status, _DEFAULT_CACHE_TTL))
             
             return work_order
             
@@ -161,7 +209,7 @@ class WorkOrderManager:
         """Get BOM components for work order"""
         try:
             # Get BOM lines
-            bom_lines = self.odoo_client.execute_kw(
+            bom_lines = await self._execute_kw(
                 'mrp.bom.line',
                 'search_read',
                 [[('bom_id', '=', bom_id)]],
@@ -170,29 +218,40 @@ class WorkOrderManager:
                 ]}
             )
             
-            components = []
-            for line in bom_lines:
-                # Get product information
-                product = self.odoo_client.execute_kw(
+            if not bom_lines:
+                return []
+            
+            # Read every product and UOM used by the BOM in one call each
+            product_ids = list({line['product_id'][0] for line in bom_lines})
+            uom_ids = list({line['product_uom_id'][0] for line in bom_lines})
+            products, uoms = await asyncio.gather(
+                self._execute_kw(
                     'product.product',
                     'read',
-                    [line['product_id'][0]],
+                    [product_ids],
                     {'fields': ['name', 'default_code', 'barcode', 'type']}
-                )[0]
-                
-                # Get UOM information
-                uom = self.odoo_client.execute_kw(
+                ),
+                self._execute_kw(
                     'uom.uom',
                     'read',
-                    [line['product_uom_id'][0]],
+                    [uom_ids],
                     {'fields': ['name']}
-                )[0]
+                )
+            )
+            products_by_id = {product['id']: product for product in products}
+            uoms_by_id = {uom['id']: uom for uom in uoms}
+            
+            components = []
+            for line in bom_lines:
+                product = products_by_id[line['product_id'][0]]
+                uom = uoms_by_id[line['product_uom_id'][0]]
                 
                 component = {
                     'product_id': line['product_id'][0],
                     'product_name': product['name'],
                     'default_code': product['default_code'],
-                    'barcode': product['barcode'],
+                    # Odoo returns False for products without a barcode
+                    'barcode': sys.intern(product['barcode']) if product['barcode'] else None,
                     'quantity': line['product_qty'],
                     'uom_id': line['product_uom_id'][0],
                     'uom_name': uom['name'],
@@ -215,16 +274,19 @@ class WorkOrderManager:
             if not self.current_work_order:
                 return False, "No work order context set", None
             
+            # Interned like the index keys, so the lookup matches by identity
+            component_barcode = sys.intern(component_barcode)
+            
             # Find component in work order BOM
-            for component in self.current_work_order.components:
-                if component['barcode'] == component_barcode:
-                    # Check if component is already fully consumed
-                    if component['remaining_quantity'] <= 0:
-                        return False, f"Component {component_barcode} already fully consumed", None
-                    
-                    return True, f"Component {component_barcode} is valid for work order {self.current_work_order.id}", component
+            component = self.current_work_order.components_by_barcode.get(component_barcode)
+            if component is None:
+                return False, f"Component {component_barcode} not found in work order {self.current_work_order.id}", None
+            
+            # Check if component is already fully consumed
+            if component['remaining_quantity'] <= 0:
+                return False, f"Component {component_barcode} already fully consumed", None
             
-            return False, f"Component {component_barcode} not found in work order {self.current_work_order.id}", None
+            return True, f"Component {component_barcode} is valid for work order {self.current_work_order.id}", component
             
         except Exception as e:
             logger.error(f"Error validating component: {e}")
@@ -242,16 +304,40 @@ class WorkOrderManager:
             if not is_valid:
                 return False, message
             
+            return await self.consume_component_by_ref(component, quantity)
+            
+        except Exception as e:
+            logger.error(f"Error consuming component: {e}")
+            return False, f"Error consuming component: {str(e)}"
+    
+    async def consume_component_by_ref(self, component: Dict[str, Any], quantity: float = 1.0) -> Tuple[bool, str]:
+        """Consume a component already returned by validate_component_for_work_order.
+        
+        Skips the barcode lookup, so callers that validated the scan
+        themselves do not pay for it twice.
+        """
+        try:
+            if not self.current_work_order:
+                return False, "No work order context set"
+            
+            component_barcode = component['barcode']
+            
             # Check if quantity is available
             if quantity > component['remaining_quantity']:
                 return False, f"Requested quantity {quantity} exceeds remaining quantity {component['remaining_quantity']}"
             
+            # Queue the stock move first, so a failure leaves nothing half booked
+            await self._create_stock_move(component, quantity)
+            
             # Update component consumption
+            was_started = component['consumed_quantity'] > 0
+            was_done = component['remaining_quantity'] <= 0
             component['consumed_quantity'] += quantity
             component['remaining_quantity'] -= quantity
-            
-            # Create stock move in Odoo
-            await self._create_stock_move(component, quantity)
+            if not was_started and component['consumed_quantity'] > 0:
+                self.current_work_order.n_any_consumed += 1
+            if not was_done and component['remaining_quantity'] <= 0:
+                self.current_work_order.n_fully_consumed += 1
             
             logger.info(f"Consumed {quantity} units of {component_barcode} for work order {self.current_work_order.id}")
             
@@ -261,15 +347,46 @@ class WorkOrderManager:
             logger.error(f"Error consuming component: {e}")
             return False, f"Error consuming component: {str(e)}"
     
+    async def _ensure_odoo_id(self) -> int:
+        """Get the Odoo database ID of the current work order, searching only if not known yet"""
+        work_order = self.current_work_order
+        if work_order.odoo_db_id is None:
+            work_order.odoo_db_id = (await self._execute_kw(
+                'mrp.production',
+                'search',
+                [[('name', '=', work_order.id)]]
+            ))[0]
+        return work_order.odoo_db_id
+    
+    async def _ensure_locations(self) -> Tuple[int, int]:
+        """Get the stock and production location IDs, looking them up in Odoo only once"""
+        if self.production_location_id is None:
+            async with self._locations_lock:
+                if self.production_location_id is None:
+                    locations = await self._execute_kw(
+                        'stock.location',
+                        'search_read',
+                        [[('usage', 'in', ['internal', 'production'])]],
+                        {'fields': ['id', 'usage'], 'order': 'id'}
+                    )
+                    # Lowest ID per usage, i.e. the first one the database created
+                    first_by_usage = {}
+                    for location in locations:
+                        first_by_usage.setdefault(location['usage'], location['id'])
+                    self.stock_location_id = first_by_usage.get('internal', DEFAULT_STOCK_LOCATION_ID)
+                    self.production_location_id = first_by_usage.get('production', DEFAULT_PRODUCTION_LOCATION_ID)
+        return self.stock_location_id, self.production_location_id
+    
     async def _create_stock_move(self, component: Dict[str, Any], quantity: float):
-        """Create stock move in Odoo for component consumption"""
+        """Queue a stock move for component consumption, created in Odoo in batches.
+        
+        Raises only if the move could not be queued. Once queued, failures
+        to create it in Odoo are retried by the flush timer.
+        """
         try:
             # Get work order ID
-            work_order = self.odoo_client.execute_kw(
-                'mrp.production',
-                'search',
-                [[('name', '=', self.current_work_order.id)]]
-            )[0]
+            work_order = await self._ensure_odoo_id()
+            stock_location_id, production_location_id = await self._ensure_locations()
             
             # Create stock move
             move_data = {
@@ -277,25 +394,114 @@ class WorkOrderManager:
                 'product_id': component['product_id'],
                 'product_uom_qty': quantity,
                 'product_uom': component['uom_id'],
-                'location_id': 8,  # Stock location
-                'location_dest_id': 9,  # Production location
+                'location_id': stock_location_id,
+                'location_dest_id': production_location_id,
                 'origin': self.current_work_order.id,
                 'reference': f"WO: {self.current_work_order.id}",
                 'state': 'done',
                 'raw_material_production_id': work_order
             }
-            
-            move_id = self.odoo_client.execute_kw(
-                'stock.move',
-                'create',
-                [move_data]
-            )
-            
-            logger.debug(f"Created stock move {move_id} for component consumption")
-            
         except Exception as e:
             logger.error(f"Error creating stock move: {e}")
             raise
+        
+        self._pending_moves.append(move_data)
+        if len(self._pending_moves) >= STOCK_MOVE_BATCH_SIZE:
+            await self._try_flush_stock_moves()
+        if self._pending_moves:
+            self._schedule_flush()
+    
+    async def flush_stock_moves(self) -> int:
+        """Create every queued stock move in Odoo with a single create call.
+        
+        Flushes are serialised, so when this returns no earlier flush is
+        still creating moves. On a transport error the moves are kept for
+        the next flush and the error is re-raised. If Odoo rejects the
+        batch, the moves are created one by one so a bad move is logged
+        and dropped instead of blocking the others.
+        """
+        async with self._flush_lock:
+            if not self._pending_moves:
+                return 0
+            
+            moves = self._pending_moves
+            self._pending_moves = []
+            try:
+                await self._execute_kw(
+                    'stock.move',
+                    'create',
+                    [moves]
+                )
+            except ODOO_TRANSPORT_ERRORS as e:
+                logger.error("Error creating %s stock moves: %s", len(moves), e)
+                # Keep them for the next flush, ahead of any queued meanwhile
+                self._pending_moves[:0] = moves
+                raise
+            except Exception as e:
+                logger.warning("Odoo rejected a batch of %s stock moves, creating them one by one: %s", len(moves), e)
+                return await self._create_stock_moves_singly(moves)
+            
+            logger.debug("Created %s stock moves for component consumption", len(moves))
+            return len(moves)
+    
+    async def _create_stock_moves_singly(self, moves: List[Dict[str, Any]]) -> int:
+        """Create stock moves one per call, dropping any that Odoo rejects"""
+        created = 0
+        for position, move in enumerate(moves):
+            try:
+                await self._execute_kw('stock.move', 'create', [move])
+            except ODOO_TRANSPORT_ERRORS as e:
+                logger.error("Error creating stock moves: %s", e)
+                self._pending_moves[:0] = moves[position:]
+                raise
+            except Exception as e:
+                logger.error("Dropping stock move '%s' (product %s, %s units) rejected by Odoo: %s",
+                             move['name'], move['product_id'], move['product_uom_qty'], e)
+            else:
+                created += 1
+        return created
+    
+    async def _try_flush_stock_moves(self) -> bool:
+        """Flush queued stock moves, returning False if the create failed"""
+        try:
+            await self.flush_stock_moves()
+            return True
+        except Exception:
+            return False  # Already logged; the moves stay queued
+    
+    def _schedule_flush(self):
+        """Start the flush timer unless it is already running"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_stock_moves_later())
+    
+    async def _flush_stock_moves_later(self):
+        """Flush queued stock moves after STOCK_MOVE_FLUSH_DELAY, retrying with backoff until none are left"""
+        delay = STOCK_MOVE_FLUSH_DELAY
+        while self._pending_moves:
+            await asyncio.sleep(delay)
+            if await self._try_flush_stock_moves():
+                delay = STOCK_MOVE_FLUSH_DELAY
+            else:
+                delay = min(delay * 2, STOCK_MOVE_MAX_RETRY_DELAY)
+    
+    async def aclose(self) -> bool:
+        """Stop the flush timer and create any queued stock moves.
+        
+        Called by the owner on shutdown. Returns False if moves could not be
+        created; they are logged and left in _pending_moves.
+        """
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        
+        if not await self._try_flush_stock_moves():
+            logger.error("%s stock moves could not be created before shutdown", len(self._pending_moves))
+            return False
+        return True
     
     async def update_work_order_progress(self, progress_percentage: float) -> Tuple[bool, str]:
         """Update work order progress"""
@@ -304,19 +510,16 @@ class WorkOrderManager:
                 return False, "No work order context set"
             
             # Update work order in Odoo
-            work_order_id = self.odoo_client.execute_kw(
-                'mrp.production',
-                'search',
-                [[('name', '=', self.current_work_order.id)]]
-            )[0]
+            work_order_id = await self._ensure_odoo_id()
             
             # Update progress
-            self.odoo_client.execute_kw(
+            await self._execute_kw(
                 'mrp.production',
                 'write',
                 [work_order_id],
                 {'progress': progress_percentage}
             )
+            self.work_order_cache.pop(self.current_work_order.id)
             
             logger.info(f"Updated work order {self.current_work_order.id} progress to {progress_percentage}%")
             
@@ -332,27 +535,29 @@ class WorkOrderManager:
             if not self.current_work_order:
                 return False, "No work order context set"
             
-            # Get work order ID
-            work_order_id = self.odoo_client.execute_kw(
-                'mrp.production',
-                'search',
-                [[('name', '=', self.current_work_order.id)]]
-            )[0]
+            # Read everything needed from the context before it is cleared
+            wo_id = self.current_work_order.id
+            work_order_id = await self._ensure_odoo_id()
+            
+            # Consumption must reach Odoo before the work order is closed; this
+            # also waits out a timer flush that is still creating moves
+            await self.flush_stock_moves()
             
             # Mark work order as done
-            self.odoo_client.execute_kw(
+            await self._execute_kw(
                 'mrp.production',
                 'write',
                 [work_order_id],
                 {'state': 'done'}
             )
+            self.work_order_cache.pop(wo_id)
             
             # Clear current work order context
             self.current_work_order = None
             
-            logger.info(f"Completed work order {self.current_work_order.id}")
+            logger.info("Completed work order %s", wo_id)
             
-            return True, f"Work order {self.current_work_order.id} completed successfully"
+            return True, f"Work order {wo_id} completed successfully"
             
         except Exception as e:
             logger.error(f"Error completing work order: {e}")
@@ -374,7 +579,7 @@ class WorkOrderManager:
             'status': self.current_work_order.status.value,
             'quantity': self.current_work_order.quantity,
             'components_count': len(self.current_work_order.components),
-            'components_consumed': sum(1 for c in self.current_work_order.components if c['consumed_quantity'] > 0),
+            'components_consumed': self.current_work_order.n_any_consumed,
             'progress_percentage': self._calculate_progress()
         }
     
@@ -384,9 +589,8 @@ class WorkOrderManager:
             return 0.0
         
         total_components = len(self.current_work_order.components)
-        consumed_components = sum(1 for c in self.current_work_order.components if c['remaining_quantity'] <= 0)
         
-        return (consumed_components / total_components) * 100
+        return (self.current_work_order.n_fully_consumed / total_components) * 100
     
     def clear_work_order_context(self):
         """Clear current work order context"""
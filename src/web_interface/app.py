@@ -4,25 +4,56 @@ Web Interface for IoT Box
 Flask-based web interface for monitoring and controlling the IoT Box system.
 """
 
+import hashlib
 import json
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from typing import Optional, Dict, Any, Tuple
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, flash
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import asyncio
 import threading
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from ..iot_box.core.event_manager import EventType
 from ..iot_box.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, used for every jsonify response"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize obj to a JSON string"""
+        try:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # Integers beyond 64 bits and similar cases orjson rejects
+            return super().dumps(obj, **kwargs)
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        """Parse a JSON string or bytes"""
+        return orjson.loads(s)
+
+
 def create_app(device_manager=None, event_manager=None, buffer_manager=None, 
-               security_manager=None, sync_service=None):
-    """Create Flask application"""
+               security_manager=None, sync_service=None,
+               loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Create Flask application.
+    
+    Async manager calls are run on ``loop``, normally the application's
+    own event loop; without one a background loop thread is started.
+    """
     app = Flask(__name__)
     app.secret_key = 'iot-box-secret-key'  # Should be from config
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
     
     # Enable CORS
     CORS(app)
@@ -34,19 +65,63 @@ def create_app(device_manager=None, event_manager=None, buffer_manager=None,
     app.security_manager = security_manager
     app.sync_service = sync_service
     
+    # Long-lived event loop shared by every request
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="web_event_loop", daemon=True).start()
+    app.loop = loop
+    
     # Register routes
     register_routes(app)
     
     return app
 
 
+async def _no_result():
+    """Placeholder for a status source that is not configured"""
+    return None
+
+
+async def _gather_status(app) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Get buffer statistics and work order status concurrently"""
+    buffer_task = app.buffer_manager.get_buffer_statistics() if app.buffer_manager else _no_result()
+    wo_task = (app.sync_service.get_work_order_status()
+               if app.sync_service and hasattr(app.sync_service, 'get_work_order_status') else _no_result())
+    return tuple(await asyncio.gather(buffer_task, wo_task))
+
+
 def register_routes(app):
     """Register Flask routes"""
     
+    def submit(coro):
+        """Run a coroutine on the app's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, app.loop).result()
+    
+    # Page shells are static (data comes from /api/*), so each is rendered once.
+    # Their links depend on the script root the app is mounted under, so that is
+    # part of the key; flashed messages are left out of the shell entirely.
+    rendered_pages: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+    
+    def render_page(template: str) -> Tuple[bytes, str]:
+        """Get a page's rendered body and ETag, rendering it on first use"""
+        key = (template, request.script_root)
+        page = rendered_pages.get(key)
+        if page is None:
+            body = render_template(template, page_shell=True).encode()
+            page = rendered_pages[key] = (body, hashlib.sha1(body).hexdigest())
+        return page
+    
+    def static_page(template: str) -> Response:
+        """Serve a cached page, answering 304 when the browser already has it"""
+        body, etag = render_page(template)
+        response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+        return response.make_conditional(request)
+    
     @app.route('/')
     def index():
         """Main dashboard"""
-        return render_template('dashboard.html')
+        return static_page('dashboard.html')
     
     @app.route('/api/status')
     def api_status():
@@ -69,15 +144,18 @@ def register_routes(app):
             if app.event_manager:
                 status['events'] = app.event_manager.get_event_statistics()
             
+            # Buffer and work order status are fetched concurrently
+            buffer_status, work_order_status = submit(_gather_status(app))
+            
             # Buffer status
             if app.buffer_manager:
-                status['buffer'] = asyncio.run(app.buffer_manager.get_buffer_statistics())
+                status['buffer'] = buffer_status
             
             # Odoo status
             if app.sync_service:
                 status['odoo'] = {
                     'connected': True,  # Should check actual connection
-                    'work_order': asyncio.run(app.sync_service.get_work_order_status()) if hasattr(app.sync_service, 'get_work_order_status') else None
+                    'work_order': work_order_status
                 }
             
             return jsonify(status)
@@ -117,8 +195,8 @@ def register_routes(app):
             
             # Create scan event
             if app.event_manager:
-                event_id = asyncio.run(app.event_manager.create_event(
-                    event_type=app.event_manager.EventType.SCAN,
+                event_id = submit(app.event_manager.create_event(
+                    event_type=EventType.SCAN,
                     device_id=device_id,
                     scan_data=scan_data,
                     scan_type=scan_type,
@@ -152,8 +230,8 @@ def register_routes(app):
             
             # Create work order event
             if app.event_manager:
-                event_id = asyncio.run(app.event_manager.create_event(
-                    event_type=app.event_manager.EventType.WORK_ORDER_SET,
+                event_id = submit(app.event_manager.create_event(
+                    event_type=EventType.WORK_ORDER_SET,
                     device_id='web_interface',
                     scan_data=work_order_id,
                     scan_type='work_order',
@@ -182,7 +260,7 @@ def register_routes(app):
             
             if app.sync_service and hasattr(app.sync_service, 'traceability_manager'):
                 if work_order_id:
-                    data = asyncio.run(app.sync_service.traceability_manager.get_work_order_traceability(work_order_id))
+                    data = submit(app.sync_service.traceability_manager.get_work_order_traceability(work_order_id))
                 else:
                     data = app.sync_service.traceability_manager.get_traceability_statistics()
                 
@@ -201,7 +279,7 @@ def register_routes(app):
             if not app.buffer_manager:
                 return jsonify({'error': 'Buffer manager not available'}), 500
             
-            success, message = asyncio.run(app.buffer_manager.sync_all())
+            success, message = submit(app.buffer_manager.sync_all())
             
             return jsonify({
                 'success': success,
@@ -215,34 +293,24 @@ def register_routes(app):
     @app.route('/devices')
     def devices():
         """Device management page"""
-        return render_template('devices.html')
+        return static_page('devices.html')
     
     @app.route('/traceability')
     def traceability():
         """Traceability page"""
-        return render_template('traceability.html')
+        return static_page('traceability.html')
     
     @app.route('/logs')
     def logs():
         """Logs page"""
-        return render_template('logs.html')
+        return static_page('logs.html')
     
     @app.errorhandler(404)
     def not_found(error):
         """404 error handler"""
-        return render_template('404.html'), 404
+        return Response(render_page('404.html')[0], status=404, mimetype='text/html')
     
     @app.errorhandler(500)
     def internal_error(error):
         """500 error handler"""
-        return render_template('500.html'), 500
-
-
-def run_async_in_thread(coro):
-    """Run async coroutine in thread"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+        return Response(render_page('500.html')[0], status=500, mimetype='text/html')
@@ -0,0 +1,34 @@
+"""
+Shared test configuration
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Make the src packages importable once for every test module
+SRC_DIR = str(Path(__file__).parent.parent / "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def event_loop_policy():
+    """Run async tests on uvloop when it is installed.
+    
+    Newer pytest-asyncio takes the policy from this fixture; older releases
+    build their loops from the global policy, so that is set as well.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        yield asyncio.get_event_loop_policy()
+        return
+    
+    previous = asyncio.get_event_loop_policy()
+    policy = uvloop.EventLoopPolicy()
+    asyncio.set_event_loop_policy(policy)
+    yield policy
+    asyncio.set_event_loop_policy(previous)
@@ -0,0 +1,149 @@
+"""
+Tests for Component Manager
+
+Unit tests for component lookups and inventory queries.
+"""
+
+import pytest
+import asyncio
+import importlib
+import sys
+import time
+import types
+from pathlib import Path
+
+
+def _import_component_module():
+    """Import the component model, bypassing the package __init__ if it cannot load.
+    
+    odoo_integration/__init__.py also imports the Odoo services, which the
+    models do not need, so when that fails the package is registered bare
+    and only the model module itself is executed.
+    """
+    try:
+        return importlib.import_module("src.odoo_integration.models.component")
+    except ImportError:
+        package = types.ModuleType("src.odoo_integration")
+        package.__path__ = [str(Path(__file__).parent.parent / "src" / "odoo_integration")]
+        sys.modules["src.odoo_integration"] = package
+        return importlib.import_module("src.odoo_integration.models.component")
+
+
+ComponentManager = _import_component_module().ComponentManager
+
+
+class FakeOdooClient:
+    """Minimal stand-in for the Odoo RPC client, recording every execute_kw call"""
+    
+    LOCATIONS = {
+        8: {'id': 8, 'name': 'WH/Stock', 'usage': 'internal'},
+        9: {'id': 9, 'name': 'Virtual Locations/Production', 'usage': 'production'},
+    }
+    
+    def __init__(self, product_rows=None):
+        self.calls = []
+        self.product_rows = product_rows or []
+    
+    def execute_kw(self, model, method, args, kwargs=None):
+        self.calls.append((model, method, args, kwargs))
+        
+        if model == 'product.product' and method == 'search_read':
+            # Slow enough for concurrent lookups to join the same fetch
+            time.sleep(0.05)
+            return self.product_rows
+        
+        if model == 'stock.quant' and method == 'read_group':
+            return [
+                {'location_id': [8, 'WH/Stock'], 'quantity': 5.0, '__count': 2},
+                {'location_id': [9, 'Virtual Locations/Production'], 'quantity': 1.0, '__count': 1},
+            ]
+        
+        if model == 'stock.location' and method == 'read':
+            # Odoo's read(ids, fields): a second positional arg would be taken as fields
+            if len(args) != 1 or not isinstance(args[0], list):
+                raise TypeError(f"read() expects [ids], got args={args!r}")
+            return [self.LOCATIONS[location_id] for location_id in args[0]]
+        
+        raise AssertionError(f"Unexpected call {model}.{method}")
+
+
+class TestComponentManager:
+    """Test cases for ComponentManager"""
+    
+    @pytest.fixture
+    def odoo_client(self):
+        """Fake Odoo client"""
+        return FakeOdooClient()
+    
+    @pytest.fixture
+    def component_manager(self, odoo_client):
+        """ComponentManager backed by the fake client"""
+        return ComponentManager(odoo_client)
+    
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_get_component_inventory_multiple_locations(self, component_manager, odoo_client):
+        """Test inventory across several locations reads them in one call"""
+        inventory = await component_manager.get_component_inventory(1)
+        
+        location_reads = [call for call in odoo_client.calls if call[0] == 'stock.location']
+        assert len(location_reads) == 1
+        assert location_reads[0][2] == [[8, 9]]
+        
+        assert inventory['total_quantity'] == 6.0
+        assert inventory['quants_count'] == 3
+        assert [location['name'] for location in inventory['locations']] == [
+            'WH/Stock', 'Virtual Locations/Production'
+        ]
+        assert [location['quantity'] for location in inventory['locations']] == [5.0, 1.0]
+    
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_concurrent_lookup_error_reaches_every_caller(self, component_manager, odoo_client):
+        """Test a failing shared fetch raises the same error in the leader and the waiter"""
+        # A row missing most fields makes building the component fail with KeyError
+        odoo_client.product_rows = [{'id': 1, 'name': 'Broken'}]
+        
+        results = await asyncio.gather(
+            component_manager.get_component_by_barcode('12345678'),
+            component_manager.get_component_by_barcode('12345678'),
+            return_exceptions=True
+        )
+        
+        assert len(odoo_client.calls) == 1
+        assert all(isinstance(result, KeyError) for result in results)
+        assert component_manager._inflight == {}
+    
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_concurrent_barcode_and_rfid_lookups_fetch_separately(self, component_manager, odoo_client):
+        """Test a barcode and an RFID tag with the same text do not share a fetch"""
+        await asyncio.gather(
+            component_manager.get_component_by_barcode('12345678'),
+            component_manager.get_component_by_rfid('12345678'),
+        )
+        
+        assert sorted(call[2][0][0][0] for call in odoo_client.calls) == ['barcode', 'x_rfid_tag']
+        assert component_manager._inflight == {}
+    
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_barcode_and_rfid_caches_are_separate(self, component_manager, odoo_client):
+        """Test a missing barcode does not hide an RFID tag with the same text"""
+        assert await component_manager.get_component_by_barcode('12345678') is None
+        
+        odoo_client.product_rows = [{
+            'id': 7, 'name': 'Bracket', 'default_code': 'BR-7', 'barcode': False,
+            'type': 'raw_material', 'categ_id': [1, 'All'], 'tracking': 'none',
+            'uom_id': [1, 'Units'], 'standard_price': 2.5, 'weight': 0.1,
+            'volume': 0.0, 'active': True,
+        }]
+        component = await component_manager.get_component_by_rfid('12345678')
+        
+        assert component is not None and component.id == 7
+        assert [call[2] for call in odoo_client.calls] == [
+            [[('barcode', '=', '12345678')]],
+            [[('x_rfid_tag', '=', '12345678')]],
+        ]
+        assert component_manager.get_cached_component('12345678', 'rfid') is component
+        assert component_manager.get_cached_component('12345678') is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -6,25 +6,43 @@ Unit tests for the device management functionality.
 
 import pytest
 import asyncio
-from unittest.mock import Mock, patch, AsyncMock
-import sys
-from pathlib import Path
-
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from unittest.mock import patch, AsyncMock
 
 from iot_box.core.device_manager import DeviceManager, Device, DeviceType, DeviceStatus
 
 
+class StubHandler:
+    """Lightweight stand-in for a device handler whose scan returns or raises a fixed result"""
+    
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.scan_calls = 0
+    
+    async def scan(self):
+        self.scan_calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
 class TestDeviceManager:
     """Test cases for DeviceManager"""
     
-    @pytest.fixture
-    def device_manager(self):
-        """Create a DeviceManager instance for testing"""
+    @pytest.fixture(scope="module")
+    def device_manager_instance(self):
+        """Shared DeviceManager, constructed once per module"""
         return DeviceManager()
     
     @pytest.fixture
+    def device_manager(self, device_manager_instance):
+        """DeviceManager for testing, reset after each test"""
+        yield device_manager_instance
+        device_manager_instance.devices.clear()
+        device_manager_instance.running = False
+        device_manager_instance._hotplug_event = asyncio.Event()
+    
+    @pytest.fixture(scope="session")
     def mock_device_config(self):
         """Mock device configuration"""
         return {
@@ -75,14 +93,14 @@ class TestDeviceManager:
         assert DeviceStatus.ERROR.value == "error"
         assert DeviceStatus.UNKNOWN.value == "unknown"
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_device_manager_initialization(self, device_manager):
         """Test device manager initialization"""
         assert device_manager.devices == {}
         assert device_manager.handlers == {}
         assert device_manager.running == False
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_device_manager_start_stop(self, device_manager):
         """Test device manager start and stop"""
         # Mock the device detection loop
@@ -158,7 +176,7 @@ class TestDeviceManager:
         assert device_statuses['device1']['status'] == 'connected'
         assert device_statuses['device2']['status'] == 'disconnected'
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_scan_device_not_connected(self, device_manager):
         """Test scanning from disconnected device"""
         device = Device("test_device", "Test Device", DeviceType.BARCODE, DeviceStatus.DISCONNECTED)
@@ -167,12 +185,11 @@ class TestDeviceManager:
         result = await device_manager.scan_device("test_device")
         assert result is None
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_scan_device_connected(self, device_manager):
         """Test scanning from connected device"""
-        # Mock handler
-        mock_handler = Mock()
-        mock_handler.scan = AsyncMock(return_value="test_scan_data")
+        # Stub handler
+        mock_handler = StubHandler(result="test_scan_data")
         
         device = Device("test_device", "Test Device", DeviceType.BARCODE, DeviceStatus.CONNECTED)
         device.handler = mock_handler
@@ -180,14 +197,13 @@ class TestDeviceManager:
         
         result = await device_manager.scan_device("test_device")
         assert result == "test_scan_data"
-        mock_handler.scan.assert_called_once()
+        assert mock_handler.scan_calls == 1
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_scan_device_error(self, device_manager):
         """Test scanning from device with error"""
-        # Mock handler that raises exception
-        mock_handler = Mock()
-        mock_handler.scan = AsyncMock(side_effect=Exception("Scan error"))
+        # Stub handler that raises exception
+        mock_handler = StubHandler(error=Exception("Scan error"))
         
         device = Device("test_device", "Test Device", DeviceType.BARCODE, DeviceStatus.CONNECTED)
         device.handler = mock_handler
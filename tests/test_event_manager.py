@@ -7,11 +7,6 @@ Unit tests for the event management functionality.
 import pytest
 import asyncio
 from unittest.mock import Mock, AsyncMock
-import sys
-from pathlib import Path
-
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from iot_box.core.event_manager import EventManager, Event, EventType, EventStatus
 
@@ -19,12 +14,23 @@ from iot_box.core.event_manager import EventManager, Event, EventType, EventStat
 class TestEventManager:
     """Test cases for EventManager"""
     
-    @pytest.fixture
-    def event_manager(self):
-        """Create an EventManager instance for testing"""
+    @pytest.fixture(scope="module")
+    def event_manager_instance(self):
+        """Shared EventManager, constructed once per module"""
         return EventManager()
     
     @pytest.fixture
+    def event_manager(self, event_manager_instance):
+        """EventManager for testing, reset after each test"""
+        yield event_manager_instance
+        event_manager_instance.events.clear()
+        event_manager_instance.event_handlers.clear()
+        event_manager_instance.running = False
+        # Queues bind to the loop of the test that used them
+        event_manager_instance.processing_queue = asyncio.Queue()
+        event_manager_instance._workers = []
+    
+    @pytest.fixture(scope="session")
     def sample_event_data(self):
         """Sample event data for testing"""
         return {
@@ -69,14 +75,14 @@ class TestEventManager:
         assert EventStatus.FAILED.value == "failed"
         assert EventStatus.CANCELLED.value == "cancelled"
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_event_manager_initialization(self, event_manager):
         """Test event manager initialization"""
         assert event_manager.events == {}
         assert event_manager.event_handlers == {}
         assert event_manager.running == False
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_event_manager_start_stop(self, event_manager):
         """Test event manager start and stop"""
         # Mock the event processor
@@ -87,7 +93,7 @@ class TestEventManager:
             await event_manager.stop()
             assert event_manager.running == False
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_create_event(self, event_manager, sample_event_data):
         """Test creating an event"""
         event_id = await event_manager.create_event(
@@ -260,7 +266,7 @@ class TestEventManager:
         assert stats['type_counts']['scan'] == 2
         assert stats['type_counts']['error'] == 1
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_retry_failed_events(self, event_manager):
         """Test retrying failed events"""
         # Create a failed event
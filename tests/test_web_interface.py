@@ -0,0 +1,65 @@
+"""
+Tests for Web Interface
+
+Unit tests for the Flask page and API routes.
+"""
+
+import pytest
+import asyncio
+
+from flask import flash, get_flashed_messages
+
+from src.web_interface.app import create_app
+
+
+class TestWebInterface:
+    """Test cases for the Flask application"""
+    
+    @pytest.fixture
+    def app(self):
+        """Application with no managers, on a loop that is never started"""
+        loop = asyncio.new_event_loop()
+        app = create_app(loop=loop)
+        yield app
+        loop.close()
+    
+    @pytest.fixture
+    def client(self, app):
+        """Flask test client"""
+        return app.test_client()
+    
+    def test_cached_page_is_identical_and_revalidates(self, client):
+        """Test a repeated page request gets the same bytes, and a 304 with its ETag"""
+        first = client.get('/')
+        assert first.status_code == 200
+        assert first.headers['ETag']
+        
+        second = client.get('/')
+        assert second.status_code == 200
+        assert second.data == first.data
+        assert second.headers['ETag'] == first.headers['ETag']
+        
+        revalidated = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+        assert revalidated.status_code == 304
+        assert revalidated.data == b''
+    
+    def test_cached_page_leaves_flashed_messages(self, app, client):
+        """Test serving a cached page neither renders nor consumes pending flashes"""
+        @app.route('/_flash')
+        def flash_message():
+            flash('Work order closed', 'success')
+            return ''
+        
+        @app.route('/_flashes')
+        def pending_flashes():
+            return {'messages': get_flashed_messages()}
+        
+        client.get('/_flash')
+        page = client.get('/')
+        
+        assert b'Work order closed' not in page.data
+        assert client.get('/_flashes').json == {'messages': ['Work order closed']}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])